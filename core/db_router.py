@@ -0,0 +1,125 @@
+"""
+Read-replica routing.
+
+Reads are only sent to the replica inside a `replica_reads()` block (the
+catalog views, the recommendation engine and admin report changelists);
+everything else, and every write, uses the default database.
+
+Read-your-writes: once a request writes anything, its remaining reads go
+to the primary, and ReplicaStickinessMiddleware sets a short-lived cookie
+so the same visitor's next requests do too, until the replica has caught
+up (REPLICA_STICKY_SECONDS). Non-GET requests never read from the replica.
+Bookkeeping writes the visitor's pages do not read back at once (product
+view tracking) run inside `unpinned_writes()` and do not pin anything.
+
+The replica is configured as DATABASES[REPLICA_DATABASE_ALIAS]; without it
+all reads stay on the primary. Locally it is a second SQLite file that
+`manage.py sync_replica` refreshes from the primary.
+"""
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+STICKY_COOKIE = 'db_pinned'
+
+# Sessions and users are always read from the primary: a visitor who just
+# registered or logged in must not look anonymous because the replica lags.
+PRIMARY_ONLY_APPS = frozenset({'sessions', 'auth', 'contenttypes', 'admin'})
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_pinned = ContextVar('pinned_to_primary', default=False)
+_wrote = ContextVar('wrote_to_primary', default=False)
+_unpinned = ContextVar('unpinned_writes', default=False)
+
+
+def replica_alias():
+    """The configured replica alias, or None if there is no replica."""
+    alias = getattr(settings, 'REPLICA_DATABASE_ALIAS', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+class replica_reads(ContextDecorator):
+    """Send the reads made inside this block (or decorated function) to the replica."""
+
+    def _recreate_cm(self):
+        # A fresh instance per call keeps the reset token thread-safe
+        return type(self)()
+
+    def __enter__(self):
+        self._token = _replica_reads.set(True)
+        return self
+
+    def __exit__(self, *exc):
+        _replica_reads.reset(self._token)
+        return False
+
+
+class unpinned_writes(ContextDecorator):
+    """
+    Writes made inside this block still go to the primary but do not pin
+    the request (or, via the cookie, the visitor) to it.
+    """
+
+    def _recreate_cm(self):
+        return type(self)()
+
+    def __enter__(self):
+        self._token = _unpinned.set(True)
+        return self
+
+    def __exit__(self, *exc):
+        _unpinned.reset(self._token)
+        return False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or _pinned.get() or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        alias = replica_alias()
+        # Reads inside a transaction must see that transaction's writes
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        if not _unpinned.get():
+            _wrote.set(True)
+            _pinned.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary, never from migrate
+        if db == replica_alias():
+            return False
+        return None
+
+
+class ReplicaStickinessMiddleware:
+    """Pins a visitor's reads to the primary for a while after they write."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = request.method not in ('GET', 'HEAD', 'OPTIONS') or STICKY_COOKIE in request.COOKIES
+        pinned_token = _pinned.set(pinned)
+        wrote_token = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            if _wrote.get() and replica_alias() is not None:
+                response.set_cookie(
+                    STICKY_COOKIE, '1',
+                    max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 10),
+                    httponly=True, samesite='Lax',
+                )
+        finally:
+            _wrote.reset(wrote_token)
+            _pinned.reset(pinned_token)
+        return response
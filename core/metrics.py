@@ -0,0 +1,242 @@
+"""
+In-process request metrics, exposed in Prometheus text format.
+
+MetricsMiddleware records, per view: a latency histogram, response counts
+by status, and the number and total time of database queries. Code paths
+worth watching on their own (the recommendation engine, segment prediction,
+plot rendering) are wrapped with @timed, and the page, fragment and
+mini-cart caches report hits and misses with count_cache().
+
+Everything is aggregated in memory by this process, under one lock held
+only for a few additions per observation; there is no external service.
+Each worker keeps its own numbers, so scrape every worker (or sum them in
+Prometheus). Staff can read them at /metrics/.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.cache import never_cache
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# name -> (type, help)
+METRICS = {
+    'cohort_http_request_duration_seconds': ('histogram', 'Time spent in the view and the middleware below it'),
+    'cohort_http_responses_total': ('counter', 'Responses by view and status code'),
+    'cohort_db_queries_per_request': ('histogram', 'Database queries made by one request'),
+    'cohort_db_queries_total': ('counter', 'Database queries by view and database alias'),
+    'cohort_db_query_seconds_total': ('counter', 'Time spent executing database queries'),
+    'cohort_function_duration_seconds': ('histogram', 'Time spent inside instrumented functions'),
+    'cohort_cache_requests_total': ('counter', 'Cache lookups by cache and result (hit, stale or miss)'),
+    'cohort_cache_hit_ratio': ('gauge', 'Share of cache lookups answered from the cache (hit or stale)'),
+}
+
+
+class _Histogram:
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+
+
+class MetricsRegistry:
+    """Counters and histograms keyed by (metric name, label pairs)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value, buckets=LATENCY_BUCKETS):
+        key = (name, labels)
+        index = bisect_left(buckets, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(buckets)
+            histogram.counts[index] += 1
+            histogram.sum += value
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def _snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: (h.buckets, list(h.counts), h.sum) for key, h in self._histograms.items()
+            }
+        return counters, histograms
+
+    def render(self):
+        """The current values in Prometheus text exposition format."""
+        counters, histograms = self._snapshot()
+        samples = {name: [] for name in METRICS}
+
+        for (name, labels), value in counters.items():
+            samples.setdefault(name, []).append((name, labels, value))
+
+        for (name, labels), (buckets, counts, total) in histograms.items():
+            lines = samples.setdefault(name, [])
+            cumulative = 0
+            for bound, count in zip(buckets, counts):
+                cumulative += count
+                lines.append((f'{name}_bucket', labels + (('le', _format_value(bound)),), cumulative))
+            cumulative += counts[-1]
+            lines.append((f'{name}_bucket', labels + (('le', '+Inf'),), cumulative))
+            lines.append((f'{name}_sum', labels, total))
+            lines.append((f'{name}_count', labels, cumulative))
+
+        lookups = {}
+        for (name, labels), value in counters.items():
+            if name == 'cohort_cache_requests_total':
+                label_map = dict(labels)
+                served, total = lookups.get(label_map['cache'], (0, 0))
+                if label_map['result'] != 'miss':
+                    served += value
+                lookups[label_map['cache']] = (served, total + value)
+        for cache_name, (served, total) in lookups.items():
+            samples['cohort_cache_hit_ratio'].append(
+                ('cohort_cache_hit_ratio', (('cache', cache_name),), served / total if total else 0)
+            )
+
+        output = []
+        for name, lines in samples.items():
+            if not lines:
+                continue
+            kind, help_text = METRICS.get(name, ('untyped', ''))
+            output.append(f'# HELP {name} {help_text}')
+            output.append(f'# TYPE {name} {kind}')
+            for sample_name, labels, value in sorted(lines, key=_sort_key):
+                output.append(f'{sample_name}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(output) + '\n'
+
+
+def _sort_key(line):
+    # Keep each series' buckets together and in bucket order
+    sample_name, labels, _value = line
+    series = tuple(pair for pair in labels if pair[0] != 'le')
+    return series, sample_name.endswith(('_sum', '_count')), sample_name
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else repr(value)
+    return str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+registry = MetricsRegistry()
+
+
+def count_cache(cache_name, result, amount=1):
+    """Record `amount` lookups in the named cache with result 'hit', 'stale' or 'miss'."""
+    if amount:
+        registry.inc('cohort_cache_requests_total', (('cache', cache_name), ('result', result)), amount)
+
+
+def timed(function_name):
+    """Decorator recording the wall time of every call in cohort_function_duration_seconds."""
+    labels = (('function', function_name),)
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.observe('cohort_function_duration_seconds', labels, time.perf_counter() - start)
+        return wrapper
+
+    return decorator
+
+
+class _QueryTimer:
+    """Database execute wrapper counting one request's queries on one connection."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+class MetricsMiddleware:
+    """
+    Times every request and counts its database queries, labelled with the
+    resolved view name. Place it first so the timing covers the other
+    middleware. Queries made while a streaming response is consumed are
+    not counted.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timers = {}
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                timers[alias] = _QueryTimer()
+                stack.enter_context(connections[alias].execute_wrapper(timers[alias]))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match is not None else '<unresolved>'
+        view_labels = (('view', view),)
+        registry.observe('cohort_http_request_duration_seconds',
+                         view_labels + (('method', request.method),), elapsed)
+        registry.inc('cohort_http_responses_total', view_labels + (('status', str(response.status_code)),))
+        registry.observe('cohort_db_queries_per_request', view_labels,
+                         sum(timer.count for timer in timers.values()), QUERY_COUNT_BUCKETS)
+        for alias, timer in timers.items():
+            if timer.count:
+                alias_labels = view_labels + (('database', alias),)
+                registry.inc('cohort_db_queries_total', alias_labels, timer.count)
+                registry.inc('cohort_db_query_seconds_total', alias_labels, timer.seconds)
+        return response
+
+
+@never_cache
+def metrics_endpoint(request):
+    """Staff-only: this worker's metrics in Prometheus text format."""
+    if not request.user.is_staff:
+        return HttpResponseForbidden('Staff access required')
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
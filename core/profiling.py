@@ -0,0 +1,201 @@
+"""
+On-demand request profiling.
+
+A request is profiled when a staff user adds `?_profile=1` (or sends an
+`X-Profile: 1` header), or when it is picked by PROFILING_SAMPLE_RATE.
+Everything the request runs below this middleware is covered: the view,
+template rendering (including tags such as show_recommendations) and the
+ML engine calls.
+
+Two profilers are available:
+
+- `_profile=1` / `cprofile`: cProfile, saved as a `.pstats` file for
+  `python -m pstats` or snakeviz. Exact call counts, but it slows the
+  request down.
+- `_profile=stacks`: a sampling profiler that reads the request thread's
+  stack every PROFILING_SAMPLE_INTERVAL seconds and saves collapsed stacks
+  (`.collapsed`) for flamegraph.pl or speedscope. Low overhead, suited to
+  sampled production traffic.
+
+Results go to PROFILING_DIR (the newest PROFILING_MAX_FILES are kept). The
+response carries an X-Profile-File header with the download URL, and staff
+can list and download them at /profiles/.
+"""
+import cProfile
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponseForbidden, JsonResponse
+from django.urls import reverse
+from django.views.decorators.cache import never_cache
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_EXTENSIONS = ('.pstats', '.collapsed')
+_FILENAME_RE = re.compile(r'^[\w.-]+\.(pstats|collapsed)$')
+
+
+def profiling_dir():
+    return os.fspath(getattr(settings, 'PROFILING_DIR', os.path.join(tempfile.gettempdir(), 'modhani-profiles')))
+
+
+class StackSampler(threading.Thread):
+    """
+    Samples one thread's Python stack at a fixed interval, counting each
+    distinct stack (root first, up to but excluding `root_frame`).
+    """
+
+    def __init__(self, thread_id, root_frame, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.root_frame = root_frame
+        self.interval = interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None and frame is not self.root_frame:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.root_frame = None
+
+    def collapsed(self):
+        """The samples in collapsed-stack format: one `frame;frame;... count` line per stack."""
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def _requested_mode(request):
+    value = request.GET.get(PROFILE_PARAM) or request.META.get(PROFILE_HEADER)
+    if not value:
+        return None
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_staff:
+        return None
+    return 'stacks' if value == 'stacks' else 'cprofile'
+
+
+def _profile_path(request, extension):
+    match = getattr(request, 'resolver_match', None)
+    view = match.view_name if match is not None else 'unresolved'
+    view = re.sub(r'[^\w.-]+', '.', view)
+    directory = profiling_dir()
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{view}-{uuid.uuid4().hex[:8]}{extension}")
+
+
+def _prune(directory):
+    keep = getattr(settings, 'PROFILING_MAX_FILES', 200)
+    entries = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith(PROFILE_EXTENSIONS)),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in entries[keep:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
+
+class ProfilingMiddleware:
+    """
+    Profiles staff requests that ask for it and a PROFILING_SAMPLE_RATE share
+    of all requests. Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = requested = _requested_mode(request)
+        if mode is None:
+            rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0)
+            if not rate or random.random() >= rate:
+                return self.get_response(request)
+            mode = 'stacks'
+
+        if mode == 'stacks':
+            sampler = StackSampler(
+                threading.get_ident(), sys._getframe(),
+                getattr(settings, 'PROFILING_SAMPLE_INTERVAL', 0.005),
+            )
+            sampler.start()
+            try:
+                response = self.get_response(request)
+            finally:
+                sampler.stop()
+            path = _profile_path(request, '.collapsed')
+            with open(path, 'w') as f:
+                f.write(sampler.collapsed())
+        else:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler (e.g. a debugger or coverage) is active
+                return self.get_response(request)
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+            path = _profile_path(request, '.pstats')
+            profiler.dump_stats(path)
+
+        _prune(os.path.dirname(path))
+        # Sampled requests are profiled silently; only staff who asked get the link
+        if requested is not None:
+            response['X-Profile-File'] = reverse('profile_download', args=[os.path.basename(path)])
+        return response
+
+
+@never_cache
+def profile_list(request):
+    """Staff-only: saved profiles, newest first."""
+    if not request.user.is_staff:
+        return HttpResponseForbidden('Staff access required')
+    directory = profiling_dir()
+    profiles = []
+    if os.path.isdir(directory):
+        for entry in os.scandir(directory):
+            if _FILENAME_RE.match(entry.name):
+                stat = entry.stat()
+                profiles.append({
+                    'name': entry.name,
+                    'size': stat.st_size,
+                    'created': stat.st_mtime,
+                    'url': reverse('profile_download', args=[entry.name]),
+                })
+    profiles.sort(key=lambda profile: profile['created'], reverse=True)
+    return JsonResponse({'profiles': profiles})
+
+
+@never_cache
+def profile_download(request, name):
+    """Staff-only: download one saved profile."""
+    if not request.user.is_staff:
+        return HttpResponseForbidden('Staff access required')
+    if not _FILENAME_RE.match(name):
+        raise Http404
+    path = os.path.join(profiling_dir(), name)
+    if not os.path.isfile(path):
+        raise Http404
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name,
+                        content_type='application/octet-stream')
@@ -10,8 +10,12 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+import os
+import tempfile
 from pathlib import Path
 
+from .sqlite_profile import apply_production_profile
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,11 +48,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.db_router.ReplicaStickinessMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'ecommerce.middleware.UserTrackingMiddleware',
@@ -66,6 +73,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'ecommerce.context_processors.mini_cart',
             ],
         },
     },
@@ -85,6 +93,100 @@ DATABASES = {
     }
 }
 
+# Production SQLite tuning (WAL, pragmas, busy timeout, persistent
+# connections), see core/sqlite_profile.py. Opt in with
+# DJANGO_SQLITE_PROFILE=production.
+SQLITE_PRODUCTION_PROFILE = os.environ.get('DJANGO_SQLITE_PROFILE') == 'production'
+if SQLITE_PRODUCTION_PROFILE:
+    apply_production_profile(DATABASES['default'])
+
+# Read replica for catalog, recommendation and admin report reads, see
+# core/db_router.py. Opt in with DJANGO_READ_REPLICA=<path to the replica
+# SQLite file> (or 1 for db.replica.sqlite3). The local stand-in is
+# refreshed from the primary with `manage.py sync_replica`.
+REPLICA_DATABASE_ALIAS = 'replica'
+REPLICA_STICKY_SECONDS = 10  # Reads stay on the primary this long after a visitor writes
+
+if os.environ.get('DJANGO_READ_REPLICA'):
+    replica_name = os.environ['DJANGO_READ_REPLICA']
+    DATABASES[REPLICA_DATABASE_ALIAS] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.replica.sqlite3' if replica_name == '1' else replica_name,
+        'TEST': {'MIRROR': 'default'},
+    }
+    if SQLITE_PRODUCTION_PROFILE:
+        apply_production_profile(DATABASES[REPLICA_DATABASE_ALIAS])
+
+DATABASE_ROUTERS = ['core.db_router.ReplicaRouter']
+
+
+# Cache
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# Used for template fragments. Point this at a shared backend (e.g. Redis or
+# Memcached) in production so all workers share one copy.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'cohort-default',
+    }
+}
+
+# Full-page cache for anonymous catalog pages (see ecommerce/page_cache.py)
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_FRESH_SECONDS = 300
+
+# ETag validators and 304 responses for product and order
+# pages (see ecommerce/conditional.py)
+CONDITIONAL_GET_ENABLED = True
+
+# Per-view latency, query and cache metrics kept in each worker's memory and
+# served to staff at /metrics/ in Prometheus format (see core/metrics.py)
+METRICS_ENABLED = True
+
+# On-demand profiling (see core/profiling.py): staff add ?_profile=1 for a
+# cProfile .pstats file or ?_profile=stacks for sampled collapsed stacks.
+# PROFILING_SAMPLE_RATE profiles that share of all requests with the
+# sampling profiler (0 disables it). Files are listed at /profiles/ and
+# written outside the source tree unless DJANGO_PROFILING_DIR says otherwise.
+PROFILING_DIR = Path(os.environ.get('DJANGO_PROFILING_DIR') or Path(tempfile.gettempdir()) / 'modhani-profiles')
+PROFILING_SAMPLE_RATE = 0
+PROFILING_SAMPLE_INTERVAL = 0.005  # seconds between stack samples
+PROFILING_MAX_FILES = 200
+
+# Background jobs (see ecommerce/jobs.py), run by `manage.py run_jobs`.
+# Catalog changes enqueue similarity, popularity and (with a shared CACHES
+# backend) cache warm-up jobs that run JOB_DEBOUNCE_SECONDS after the last
+# change (at most JOB_DEBOUNCE_MAX_SECONDS after the first). Failed jobs are retried with
+# exponential backoff starting at JOB_RETRY_BACKOFF_SECONDS.
+JOB_DEBOUNCE_SECONDS = 30
+JOB_DEBOUNCE_MAX_SECONDS = 300
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF_SECONDS = 30
+JOB_TIMEOUT_SECONDS = 30 * 60  # Running longer than this means the worker died
+JOB_RETENTION_DAYS = 7
+# Jobs the worker runs periodically: name -> interval in seconds
+JOB_SCHEDULE = {
+    'refresh_popularity': 15 * 60,
+}
+
+# Load the segmentation model at startup instead of on the first request.
+# /health/ready/ returns 503 until it is loaded.
+CLUSTER_REGISTRY_PRELOAD = True
+
+# Build the in-process autocomplete index at startup instead of on the first
+# keystroke (see ecommerce/autocomplete.py)
+AUTOCOMPLETE_PRELOAD = True
+
+# Precomputed segment lookup grid: incomes (k$) from 0 to SEGMENT_GRID_INCOME_MAX
+# in steps of SEGMENT_GRID_INCOME_STEP, for every spending score 1-100.
+SEGMENT_GRID_INCOME_MAX = 200
+SEGMENT_GRID_INCOME_STEP = 1
+
+# How often (seconds) each worker checks ml_engine/saved_models/CURRENT for a
+# newly published model version. None disables hot reloading.
+MODEL_RELOAD_CHECK_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
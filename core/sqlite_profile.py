@@ -0,0 +1,48 @@
+"""
+Opt-in production tuning for the SQLite database.
+
+Enabled by setting DJANGO_SQLITE_PROFILE=production in the environment
+(see core/settings.py). Every new connection then runs:
+
+- journal_mode=WAL: readers no longer block the writer (or vice versa);
+  only writers queue behind each other.
+- synchronous=NORMAL: fsync at checkpoints instead of every commit. Safe
+  against corruption in WAL mode; a power loss may drop the last commits.
+- mmap_size / cache_size: serve reads from memory-mapped pages and a larger
+  page cache.
+- busy_timeout: wait for the write lock instead of failing at once with
+  "database is locked".
+
+Transactions start with BEGIN IMMEDIATE, so a transaction that reads
+before it writes (get_or_create, update_or_create) takes the write lock up
+front and waits on busy_timeout, instead of failing when it upgrades from
+a read lock. Connections are kept open between requests.
+"""
+
+BUSY_TIMEOUT_SECONDS = 5
+
+PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('mmap_size', 256 * 1024 * 1024),
+    ('cache_size', -64 * 1024),  # negative = KiB, i.e. 64 MiB
+    ('busy_timeout', BUSY_TIMEOUT_SECONDS * 1000),
+    ('temp_store', 'MEMORY'),
+)
+
+CONN_MAX_AGE = 600
+
+
+def init_command():
+    return ';'.join(f'PRAGMA {name}={value}' for name, value in PRAGMAS)
+
+
+def apply_production_profile(database):
+    """Update a DATABASES entry in place with the production SQLite options."""
+    options = database.setdefault('OPTIONS', {})
+    options['init_command'] = init_command()
+    options['transaction_mode'] = 'IMMEDIATE'
+    options['timeout'] = BUSY_TIMEOUT_SECONDS
+    database['CONN_MAX_AGE'] = CONN_MAX_AGE
+    database['CONN_HEALTH_CHECKS'] = True
+    return database
@@ -0,0 +1,20 @@
+"""
+Helpers for work done when a process starts (model and index warm-up).
+
+Warm-up only makes sense in processes that will serve requests, not in
+one-off management commands such as migrate or shell, nor in the
+runserver autoreloader, which only watches files and restarts a child.
+"""
+import os
+import sys
+
+
+def serves_requests():
+    """False for manage.py commands other than runserver and for the runserver reloader."""
+    if len(sys.argv) < 2 or os.path.basename(sys.argv[0]) not in ('manage.py', 'django-admin'):
+        # WSGI servers, or a script that set Django up itself
+        return True
+    if sys.argv[1] != 'runserver':
+        return False
+    # The reloader sets RUN_MAIN in the child it restarts; with --noreload there is no child
+    return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv[2:]
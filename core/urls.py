@@ -1,14 +1,28 @@
+import re
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from core.metrics import metrics_endpoint
+from core.profiling import profile_download, profile_list
+from ecommerce.images import serve_derivative
+from ml_engine.views import readiness, segment_batch
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('health/ready/', readiness, name='readiness'),
+    path('metrics/', metrics_endpoint, name='metrics'),
+    path('profiles/', profile_list, name='profile_list'),
+    path('profiles/<str:name>', profile_download, name='profile_download'),
+    path('api/segments/', segment_batch, name='segment_batch'),
     path('customer-segmentation/', include('web_interface.urls')),  # Moved CohortAI interface to /customer-segmentation
     path('', include('ecommerce.urls')),  # E-commerce store as home page
 ]
 
 # Serve media files in development
 if settings.DEBUG:
+    # Content-hashed image derivatives get far-future cache headers
+    urlpatterns += [
+        re_path(r'^%sderivatives/(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_derivative),
+    ]
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -14,3 +14,15 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_wsgi_application()
+
+# Load the segmentation model and the autocomplete index before serving requests. With a pre-forking
+# server (e.g. gunicorn --preload) this runs once in the master and the
+# workers inherit the loaded model.
+from django.db import connections  # noqa: E402
+from ecommerce.autocomplete import PrefixIndex  # noqa: E402
+from ml_engine.registry import ClusterRegistry  # noqa: E402
+
+ClusterRegistry.warm_up()
+PrefixIndex.warm_up()
+# Forked workers must not share the connection used to build the index
+connections.close_all()
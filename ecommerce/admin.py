@@ -1,5 +1,46 @@
 from django.contrib import admin
-from .models import Category, Product, CustomerProfile, Cart, Order, OrderItem, ProductTag, UserProductInteraction, ProductSimilarity
+from django.db.models import Q
+from django.utils import timezone
+from core.db_router import replica_reads
+from .pagination import EstimatedCountPaginator
+from .models import Category, Product, CustomerProfile, Cart, Order, OrderItem, ProductTag, UserProductInteraction, ProductSimilarity, Job
+
+
+class ReplicaReportMixin:
+    """Changelists of report-style models are read-only; run them on the read replica."""
+
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'GET':
+            return super().changelist_view(request, extra_context)
+        with replica_reads():
+            response = super().changelist_view(request, extra_context)
+            # TemplateResponse runs its queries when rendered; do it inside the block
+            if hasattr(response, 'render'):
+                response.render()
+        return response
+
+
+class LargeTableAdminMixin:
+    """
+    For tables with millions of rows: no exact COUNT(*) per page load, the
+    related objects of each row fetched in the same query, and raw-id
+    widgets instead of <select>s listing every user and product.
+
+    The search box matches `search_fields` exactly and case-sensitively:
+    the admin's own lookups (even "=") use iexact, which no index on the
+    username or slug columns can answer.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        condition = Q()
+        for field in self.get_search_fields(request):
+            condition |= Q(**{field: search_term})
+        return queryset.filter(condition), False
 
 
 @admin.register(Category)
@@ -18,7 +59,7 @@ class ProductAdmin(admin.ModelAdmin):
 
 
 @admin.register(CustomerProfile)
-class CustomerProfileAdmin(admin.ModelAdmin):
+class CustomerProfileAdmin(ReplicaReportMixin, admin.ModelAdmin):
     list_display = ['user', 'annual_income', 'spending_score', 'segment', 'segment_label']
     list_filter = ['segment', 'segment_label']
     search_fields = ['user__username', 'user__email']
@@ -37,7 +78,7 @@ class OrderItemInline(admin.TabularInline):
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(ReplicaReportMixin, admin.ModelAdmin):
     list_display = ['order_number', 'user', 'total_amount', 'status', 'created_at']
     list_filter = ['status', 'created_at']
     search_fields = ['order_number', 'user__username']
@@ -53,15 +94,50 @@ class ProductTagAdmin(admin.ModelAdmin):
 
 
 @admin.register(UserProductInteraction)
-class UserProductInteractionAdmin(admin.ModelAdmin):
+class UserProductInteractionAdmin(LargeTableAdminMixin, ReplicaReportMixin, admin.ModelAdmin):
     list_display = ['user', 'product', 'interaction_type', 'created_at']
+    # Both filters and the ordering are served by the (type, created_at, id)
+    # and (created_at, id) indexes
     list_filter = ['interaction_type', 'created_at']
-    search_fields = ['user__username', 'product__name']
+    list_select_related = ['user', 'product']
+    raw_id_fields = ['user', 'product']
+    search_fields = ['user__username', 'product__slug']
+    search_help_text = 'Exact username or product slug'
     readonly_fields = ['created_at']
 
 
 @admin.register(ProductSimilarity)
-class ProductSimilarityAdmin(admin.ModelAdmin):
+class ProductSimilarityAdmin(LargeTableAdminMixin, ReplicaReportMixin, admin.ModelAdmin):
     list_display = ['product', 'similar_product', 'similarity_score']
     list_filter = ['product__category']
-    search_fields = ['product__name', 'similar_product__name']
+    list_select_related = ['product', 'similar_product']
+    raw_id_fields = ['product', 'similar_product']
+    search_fields = ['product__slug', 'similar_product__slug']
+    search_help_text = 'Exact product slug'
+    # Each product's matches together, best first: the (product, -similarity_score) index
+    ordering = ['product_id', '-similarity_score']
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'status', 'attempts', 'max_attempts', 'run_after', 'started_at', 'finished_at', 'duration']
+    list_filter = ['status', 'name']
+    readonly_fields = ['name', 'payload', 'status', 'attempts', 'max_attempts', 'run_after',
+                       'last_error', 'created_at', 'started_at', 'finished_at']
+    actions = ['retry_jobs']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description='Duration')
+    def duration(self, obj):
+        if obj.started_at and obj.finished_at:
+            return f"{(obj.finished_at - obj.started_at).total_seconds():.1f}s"
+        return '-'
+
+    @admin.action(description='Retry selected jobs now')
+    def retry_jobs(self, request, queryset):
+        count = queryset.exclude(status='running').update(
+            status='pending', attempts=0, run_after=timezone.now(), finished_at=None,
+        )
+        self.message_user(request, f"{count} job(s) queued to run again.")
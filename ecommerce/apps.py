@@ -1,4 +1,7 @@
 from django.apps import AppConfig
+from django.conf import settings
+
+from core.startup import serves_requests
 
 
 class EcommerceConfig(AppConfig):
@@ -7,3 +10,8 @@ class EcommerceConfig(AppConfig):
     
     def ready(self):
         import ecommerce.signals
+
+        # Build the autocomplete index at startup so no keystroke waits for it
+        if getattr(settings, 'AUTOCOMPLETE_PRELOAD', True) and serves_requests():
+            from .autocomplete import PrefixIndex
+            PrefixIndex.warm_up_in_background()
@@ -0,0 +1,229 @@
+"""
+In-process prefix index for search-as-you-type suggestions.
+
+The index is a sorted list of (key, entry) pairs searched with bisect, built
+once per process from Product and ProductTag names at startup (see
+EcommerceConfig.ready and core/wsgi.py) and then kept up to date by the
+catalog signals. Lookups never touch the database.
+"""
+import bisect
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from .models import Product, ProductTag
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(text):
+    return ' '.join(_WORD_RE.findall(text.lower()))
+
+
+class PrefixIndex:
+    _instance = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        """
+        Singleton Pattern: the index is built once (at startup, or by the
+        first caller if that has not finished) and shared by every request
+        handled by this process.
+        """
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    index = PrefixIndex()
+                    index.build()
+                    cls._instance = index
+        cls._instance._refresh_if_stale()
+        return cls._instance
+
+    @classmethod
+    def warm_up(cls):
+        """Build the index now (blocking). Call before forking workers to share it."""
+        return cls.get_instance()
+
+    @classmethod
+    def warm_up_in_background(cls):
+        """Start building in a daemon thread; requests arriving meanwhile wait on the lock."""
+        if cls._instance is not None:
+            return None
+
+        def build():
+            from django.db import connection
+            try:
+                cls.warm_up()
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=build, name='autocomplete-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    @classmethod
+    def loaded_instance(cls):
+        """Return the index only if this process has already built it."""
+        return cls._instance
+
+    def __init__(self):
+        # (sorted list of (key, entry_id), {entry_id: (suggestion, [keys])}).
+        # Writers swap in a new tuple, so readers always see a consistent pair.
+        self._state = ([], {})
+        self._write_lock = threading.Lock()
+        self._built_at = 0.0
+        self._refreshing = False
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def build(self):
+        """(Re)build the whole index from the database."""
+        keys = []
+        entries = {}
+        products = Product.objects.filter(is_active=True).values_list('id', 'name', 'slug')
+        for product_id, name, slug in products.iterator():
+            entry_id, suggestion = self._product_entry(product_id, name, slug)
+            entry_keys = self._keys_for(name)
+            entries[entry_id] = (suggestion, entry_keys)
+            keys.extend((key, entry_id) for key in entry_keys)
+        for tag_id, name, slug in ProductTag.objects.values_list('id', 'name', 'slug').iterator():
+            entry_id, suggestion = self._tag_entry(tag_id, name, slug)
+            entry_keys = self._keys_for(name)
+            entries[entry_id] = (suggestion, entry_keys)
+            keys.extend((key, entry_id) for key in entry_keys)
+        keys.sort()
+        with self._write_lock:
+            self._state = (keys, entries)
+            self._built_at = time.monotonic()
+
+    def _refresh_if_stale(self):
+        """
+        Signals only update the process that saved the object, so other
+        workers rebuild in a background thread once the index is older than
+        AUTOCOMPLETE_REFRESH_SECONDS. Requests keep using the old index.
+        """
+        max_age = getattr(settings, 'AUTOCOMPLETE_REFRESH_SECONDS', 300)
+        if not max_age or time.monotonic() - self._built_at < max_age:
+            return
+        # Concurrent requests may all see a stale index; only one rebuilds it
+        with self._write_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def refresh():
+            from django.db import connection
+            try:
+                self.build()
+            finally:
+                self._refreshing = False
+                connection.close()
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    @staticmethod
+    def _keys_for(name):
+        """Index every word suffix of the name so a prefix can match any word in it."""
+        words = normalize(name).split()
+        return [' '.join(words[i:]) for i in range(len(words))]
+
+    @staticmethod
+    def _product_entry(product_id, name, slug):
+        return ('product', product_id), {
+            'type': 'product',
+            'name': name,
+            'url': reverse('ecommerce:product_detail', kwargs={'product_slug': slug}),
+        }
+
+    @staticmethod
+    def _tag_entry(tag_id, name, slug):
+        return ('tag', tag_id), {
+            'type': 'tag',
+            'name': name,
+            'url': reverse('ecommerce:product_list') + '?' + urlencode({'search': name}),
+        }
+
+    # ------------------------------------------------------------------
+    # Incremental updates (called from signals)
+    # ------------------------------------------------------------------
+
+    def _put(self, entry_id, suggestion, name):
+        with self._write_lock:
+            keys, entries = self._without(entry_id)
+            entry_keys = self._keys_for(name)
+            for key in entry_keys:
+                bisect.insort(keys, (key, entry_id))
+            entries[entry_id] = (suggestion, entry_keys)
+            self._state = (keys, entries)
+
+    def _without(self, entry_id):
+        """Copies of the current keys and entries with `entry_id` dropped."""
+        keys, entries = self._state
+        keys, entries = list(keys), dict(entries)
+        if entry_id in entries:
+            _, entry_keys = entries.pop(entry_id)
+            for key in entry_keys:
+                pos = bisect.bisect_left(keys, (key, entry_id))
+                if pos < len(keys) and keys[pos] == (key, entry_id):
+                    del keys[pos]
+        return keys, entries
+
+    def _remove(self, entry_id):
+        with self._write_lock:
+            self._state = self._without(entry_id)
+
+    def update_product(self, product):
+        if product.is_active:
+            entry_id, suggestion = self._product_entry(product.id, product.name, product.slug)
+            self._put(entry_id, suggestion, product.name)
+        else:
+            self._remove(('product', product.id))
+
+    def remove_product(self, product_id):
+        self._remove(('product', product_id))
+
+    def update_tag(self, tag):
+        entry_id, suggestion = self._tag_entry(tag.id, tag.name, tag.slug)
+        self._put(entry_id, suggestion, tag.name)
+
+    def remove_tag(self, tag_id):
+        self._remove(('tag', tag_id))
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def suggest(self, prefix, limit=10):
+        """
+        Return up to `limit` suggestions whose name has a word starting with
+        `prefix`. Names that start with the prefix rank first.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        keys, entries = self._state
+
+        matches = {}
+        pos = bisect.bisect_left(keys, (prefix,))
+        while pos < len(keys) and len(matches) < limit * 5:
+            key, entry_id = keys[pos]
+            if not key.startswith(prefix):
+                break
+            if entry_id not in matches:
+                suggestion, entry_keys = entries[entry_id]
+                # Position of the matching word inside the name (0 = name start)
+                matches[entry_id] = (entry_keys.index(key), suggestion)
+            pos += 1
+
+        ranked = sorted(
+            matches.values(),
+            key=lambda m: (m[0], m[1]['type'] != 'product', m[1]['name'].lower())
+        )
+        return [suggestion for _, suggestion in ranked[:limit]]
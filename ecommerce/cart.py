@@ -0,0 +1,72 @@
+"""
+Cart totals computed in the database, and the cached mini-cart summary.
+
+`cart_totals` replaces summing `item.total_price` in Python (which loads
+every Product and recomputes `current_price` per row) with one aggregate
+query. The header badge reads `mini_cart`, which is cached per user and
+per cart version. The version lives in the visitor's session, so every
+worker sees a change at once; views that change the cart call
+`cart_changed(request)`. Price changes show up once the entry expires.
+"""
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Case, Count, DecimalField, F, Sum, When
+
+from core.metrics import count_cache
+
+from .models import Cart
+
+# Also bounds how long a price change can take to reach the badge total
+MINI_CART_TIMEOUT = 10 * 60
+CART_VERSION_SESSION_KEY = '_cart_version'
+
+# Same rule as Product.current_price: the discount price wins when it is set
+CURRENT_PRICE = Case(
+    When(product__discount_price__gt=0, then=F('product__discount_price')),
+    default=F('product__price'),
+    output_field=DecimalField(max_digits=10, decimal_places=2),
+)
+
+
+def cart_items(user):
+    """The user's cart lines with product and category loaded in the same query."""
+    return Cart.objects.filter(user=user).select_related('product__category')
+
+
+def cart_totals(user):
+    """Return {'count': lines, 'quantity': units, 'total': Decimal} in one query."""
+    totals = Cart.objects.filter(user=user).aggregate(
+        line_count=Count('id'),
+        unit_count=Sum('quantity'),
+        total=Sum(
+            CURRENT_PRICE * F('quantity'),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+    )
+    return {
+        'count': totals['line_count'],
+        'quantity': totals['unit_count'] or 0,
+        'total': Decimal(totals['total'] or 0).quantize(Decimal('0.01')),
+    }
+
+
+def cart_changed(request):
+    """Give the visitor's cart a new version, so the next mini_cart() is recomputed."""
+    # Unique across sessions, so a new login never reuses another session's entry
+    version = time.time_ns()
+    request.session[CART_VERSION_SESSION_KEY] = version
+    return version
+
+
+def mini_cart(request):
+    """Cached cart summary for the header badge of the logged-in visitor."""
+    version = request.session.get(CART_VERSION_SESSION_KEY) or cart_changed(request)
+    key = f'minicart:{request.user.id}:{version}'
+    summary = cache.get(key)
+    count_cache('mini_cart', 'miss' if summary is None else 'hit')
+    if summary is None:
+        summary = cart_totals(request.user)
+        cache.set(key, summary, MINI_CART_TIMEOUT)
+    return summary
@@ -0,0 +1,108 @@
+"""
+Order placement.
+
+Checkout runs as one transaction with a fixed number of queries regardless
+of basket size: a single conditional UPDATE decrements stock for every line
+(and matches fewer rows than expected if anything would oversell), then the
+order items and purchase interactions are written with one bulk insert each.
+The catalog version is only bumped when an order sells a product out.
+"""
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Now
+
+from .models import Cart, Order, OrderItem, Product, UserProductInteraction
+from .versions import bump_catalog_version
+
+
+class OutOfStockError(Exception):
+    """Raised when at least one cart line can no longer be fulfilled."""
+
+    def __init__(self, products):
+        self.products = products
+        names = ', '.join(p.name for p in products)
+        super().__init__(f'Not enough stock for: {names}')
+
+
+class EmptyCartError(Exception):
+    pass
+
+
+def place_order(user, shipping_address):
+    """Turn the user's cart into an order. Returns the new Order."""
+    with transaction.atomic():
+        cart_items = list(Cart.objects.filter(user=user).select_related('product'))
+        if not cart_items:
+            raise EmptyCartError()
+
+        quantities = {item.product_id: item.quantity for item in cart_items}
+        quantity_for_row = Case(
+            *[When(id=product_id, then=Value(quantity)) for product_id, quantity in quantities.items()],
+            output_field=IntegerField(),
+        )
+
+        # Race-free decrement: the stock check happens inside the UPDATE itself
+        updated = Product.objects.filter(
+            id__in=quantities, is_active=True, stock__gte=quantity_for_row
+        ).update(stock=F('stock') - quantity_for_row, updated_at=Now())
+
+        if updated != len(quantities):
+            # Roll back the partial decrement, then report which lines are short
+            transaction.set_rollback(True)
+            oversold = True
+        else:
+            oversold = False
+            order = _create_order(user, shipping_address, cart_items, quantities)
+
+    if oversold:
+        products = Product.objects.filter(id__in=quantities).only('id', 'name', 'stock', 'is_active')
+        raise OutOfStockError([
+            p for p in products if not p.is_active or p.stock < quantities[p.id]
+        ])
+    return order
+
+
+def _create_order(user, shipping_address, cart_items, quantities):
+    """Write the order, its items and the purchase interactions (inside the checkout transaction)."""
+    total = sum(item.product.current_price * item.quantity for item in cart_items)
+    order = Order.objects.create(
+        user=user,
+        total_amount=total,
+        shipping_address=shipping_address,
+    )
+
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product=item.product,
+            quantity=item.quantity,
+            price=item.product.current_price,
+        )
+        for item in cart_items
+    ])
+
+    # bulk_create skips the track_purchases signal, so upsert the interactions here
+    UserProductInteraction.objects.bulk_create(
+        [
+            UserProductInteraction(
+                user=user,
+                product_id=product_id,
+                interaction_type='purchase',
+                interaction_weight=1.0,
+            )
+            for product_id in quantities
+        ],
+        update_conflicts=True,
+        unique_fields=['user', 'product', 'interaction_type'],
+        update_fields=['interaction_weight'],
+    )
+
+    Cart.objects.filter(id__in=[item.id for item in cart_items]).delete()
+
+    # The UPDATE moved updated_at, which product cards and pages are keyed on.
+    # Only a product selling out changes what the whole catalog shows (its
+    # buttons and availability), so only then are the catalog caches dropped.
+    if Product.objects.filter(id__in=quantities, stock=0).exists():
+        transaction.on_commit(bump_catalog_version)
+
+    return order
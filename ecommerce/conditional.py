@@ -0,0 +1,123 @@
+"""
+Conditional GET (ETag) for catalog and order pages.
+
+Before the view runs, a validator function looks up only what the page
+depends on: the object's `updated_at`, the catalog version and the header
+state (who is logged in, the mini-cart badge, the CSRF cookie). If the
+client's If-None-Match still matches, it gets a 304 without the page being
+rendered. No Last-Modified is sent: a date can only follow `updated_at`,
+so If-Modified-Since would miss catalog and cart changes. Personalised
+recommendations are not part of the validators; the product page loads
+them from a separate endpoint.
+
+Views that render from the read replica must apply `replica_reads()`
+outside this decorator, so the validators describe the same data as the
+page; otherwise a lagging replica's page would get the primary's ETag.
+
+Pages are never validated while flash messages are pending, since a 304
+would show the cached copy without them.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+
+from core.metrics import count_cache
+
+from .cart import mini_cart
+from .models import CustomerProfile, Order, Product
+from .versions import catalog_version
+
+
+def _header_state(request):
+    """What base.html renders differently per visitor."""
+    parts = [request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')]
+    if request.user.is_authenticated:
+        cart = mini_cart(request)
+        parts += [request.user.pk, cart['count'], cart['total']]
+    return parts
+
+
+def _make_etag(parts):
+    return quote_etag(hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest())
+
+
+def _set_validators(request, response, etag):
+    response.headers.setdefault('ETag', etag)
+    # Browsers and proxies may keep the page but must revalidate it every time
+    if request.user.is_authenticated:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+
+
+def conditional_page(validators):
+    """
+    Answer GET/HEAD requests for this view with 304 Not Modified when the
+    client's copy is current. `validators(request, *args, **kwargs)` returns
+    the values the page depends on, or None if the object does not exist, in
+    which case the view runs and renders its 404.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if (not getattr(settings, 'CONDITIONAL_GET_ENABLED', True)
+                    or request.method not in ('GET', 'HEAD')
+                    or len(get_messages(request))):
+                return view_func(request, *args, **kwargs)
+
+            parts = validators(request, *args, **kwargs)
+            if parts is None:
+                return view_func(request, *args, **kwargs)
+            etag = _make_etag(list(parts) + _header_state(request))
+
+            response = get_conditional_response(request, etag=etag)
+            if response is not None:
+                count_cache('conditional_get', 'hit')
+                _set_validators(request, response, etag)
+                return response
+
+            count_cache('conditional_get', 'miss')
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                _set_validators(request, response, etag)
+            return response
+
+        return wrapper
+    return decorator
+
+
+# Validators
+
+def product_list_validators(request, category_slug=None):
+    parts = ['product_list', catalog_version()]
+    if request.user.is_authenticated:
+        # The segment filter link and the personalized list follow the customer's segment
+        segment = CustomerProfile.objects.filter(user=request.user).values_list('segment', flat=True).first()
+        parts.append(segment)
+    return parts
+
+
+def product_detail_validators(request, product_slug):
+    updated_at = (
+        Product.objects.filter(slug=product_slug, is_active=True)
+        .values_list('updated_at', flat=True).first()
+    )
+    if updated_at is None:
+        return None
+    # The catalog version covers the same-category products shown below
+    return ['product_detail', updated_at.isoformat(), catalog_version()]
+
+
+def order_detail_validators(request, order_number):
+    updated_at = (
+        Order.objects.filter(order_number=order_number, user=request.user)
+        .values_list('updated_at', flat=True).first()
+    )
+    if updated_at is None:
+        return None
+    # Item names and images come from the products
+    return ['order_detail', updated_at.isoformat(), catalog_version()]
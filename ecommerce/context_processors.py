@@ -0,0 +1,15 @@
+from django.utils.functional import SimpleLazyObject
+from .cart import mini_cart as cached_mini_cart
+
+
+def mini_cart(request):
+    """
+    Cart count and total for the header badge. Lazy, so pages that don't
+    show it (and anonymous visitors) never touch the cache or the session.
+    """
+    def summary():
+        if not request.user.is_authenticated:
+            return {'count': 0, 'quantity': 0, 'total': 0}
+        return cached_mini_cart(request)
+
+    return {'mini_cart': SimpleLazyObject(summary)}
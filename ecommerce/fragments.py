@@ -0,0 +1,76 @@
+"""
+Versioned template fragment caching for product cards and category navigation.
+
+Card keys include the product's version (its `updated_at`), so saving a
+product makes its old fragments unreachable instead of having to delete
+them. Saving a category bumps the versions of its products (their cards show
+category data) and the catalog-wide category version used by the navigation
+fragments. A page of cards is fetched with a single `get_many`.
+"""
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+
+from core.metrics import count_cache
+
+from .versions import category_version
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+# Rendered into cached cards in place of the per-user CSRF token
+CSRF_PLACEHOLDER = 'CSRFTOKENPLACEHOLDER'
+
+
+def product_version(product):
+    return int(product.updated_at.timestamp() * 1000000)
+
+
+def card_key(template_name, product):
+    return f'fragment:{template_name}:{product.id}:{product_version(product)}'
+
+
+def render_product_cards(products, template_name, request=None):
+    """
+    Render one card per product, reusing cached fragments.
+    Returns the cards' HTML in the same order as `products`.
+    """
+    products = list(products)
+    keys = [card_key(template_name, p) for p in products]
+    cached = cache.get_many(keys)
+
+    missing = {}
+    for key, product in zip(keys, products):
+        if key not in cached:
+            missing[key] = render_to_string(
+                template_name, {'product': product, 'csrf_token': CSRF_PLACEHOLDER}
+            )
+    count_cache('product_card', 'hit', len(cached))
+    count_cache('product_card', 'miss', len(missing))
+    if missing:
+        cache.set_many(missing, FRAGMENT_TIMEOUT)
+        cached.update(missing)
+
+    cards = [cached[key] for key in keys]
+    if request is not None and any(CSRF_PLACEHOLDER in card for card in cards):
+        token = get_token(request)
+        cards = [card.replace(CSRF_PLACEHOLDER, token) for card in cards]
+    return cards
+
+
+def render_category_nav(template_name, current_category=None, limit=None):
+    """Render the category navigation, cached per category version."""
+    current_slug = current_category.slug if current_category else ''
+    key = f'fragment:{template_name}:{category_version()}:{current_slug}:{limit or ""}'
+    html = cache.get(key)
+    count_cache('category_nav', 'miss' if html is None else 'hit')
+    if html is None:
+        from .models import Category
+        categories = Category.objects.all()
+        if limit:
+            categories = categories[:limit]
+        html = render_to_string(template_name, {
+            'categories': categories,
+            'current_category': current_category,
+        })
+        cache.set(key, html, FRAGMENT_TIMEOUT)
+    return html
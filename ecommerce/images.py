@@ -0,0 +1,123 @@
+"""
+Image derivative pipeline for product images.
+
+Each upload is resized to the sizes listing pages actually display and saved
+as WebP plus a JPEG/PNG fallback under MEDIA_ROOT/derivatives/. File names
+contain a hash of the source bytes and the size, so a derivative never
+changes once written and can be served with far-future cache headers.
+The generated paths are stored on the model in `image_derivatives`.
+"""
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from django.views.static import serve
+
+DERIVATIVE_DIR = 'derivatives'
+
+# name -> bounding box (2x the CSS size the templates render at): listing
+# cards, and the item rows of the cart, checkout and order pages
+SIZES = {
+    'card': (640, 480),
+    'thumb': (192, 192),
+}
+
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+
+FAR_FUTURE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def _source_hash(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == 'webp':
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    elif fmt == 'png':
+        image.save(buffer, 'PNG', optimize=True)
+    else:
+        image.convert('RGB').save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def generate_derivatives(image_field, force=False):
+    """
+    Build every size/format for an ImageField file and return
+    {'source': name, size: {'webp': path, 'fallback': path, 'width': w, 'height': h}}.
+    Existing files are reused unless `force` is set.
+    """
+    if not image_field:
+        return {}
+    # Imported here so that loading the URLconf/signals does not import Pillow
+    from PIL import Image, ImageOps
+
+    image_field.open('rb')
+    try:
+        data = image_field.read()
+    finally:
+        image_field.close()
+
+    digest = _source_hash(data)
+    source = Image.open(io.BytesIO(data))
+    source = ImageOps.exif_transpose(source)
+    has_alpha = source.mode in ('RGBA', 'LA') or (source.mode == 'P' and 'transparency' in source.info)
+    fallback_format = 'png' if has_alpha else 'jpeg'
+    if source.mode not in ('RGB', 'RGBA'):
+        source = source.convert('RGBA' if has_alpha else 'RGB')
+
+    derivatives = {'source': image_field.name}
+    for size_name, box in SIZES.items():
+        resized = source.copy()
+        resized.thumbnail(box, Image.LANCZOS)
+        entry = {'width': resized.width, 'height': resized.height}
+        for key, fmt in (('webp', 'webp'), ('fallback', fallback_format)):
+            ext = 'jpg' if fmt == 'jpeg' else fmt
+            path = f'{DERIVATIVE_DIR}/{digest}-{size_name}.{ext}'
+            if force or not default_storage.exists(path):
+                if force and default_storage.exists(path):
+                    default_storage.delete(path)
+                path = default_storage.save(path, ContentFile(_encode(resized, fmt)))
+            entry[key] = path
+        derivatives[size_name] = entry
+    return derivatives
+
+
+def update_derivatives(instance, force=False):
+    """
+    Regenerate the derivatives of a Product and store their
+    paths with a queryset update (no save signals are re-triggered).
+    Returns True if anything changed.
+    """
+    current = instance.image_derivatives or {}
+    if not force and current.get('source') == (instance.image.name or None):
+        return False
+    try:
+        derivatives = generate_derivatives(instance.image, force=force)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not generate image derivatives for {instance}: {e}")
+        derivatives = {}
+
+    if derivatives == instance.image_derivatives:
+        return False
+
+    # Product cards are cached per updated_at, so move it along with the new images
+    type(instance).objects.filter(pk=instance.pk).update(image_derivatives=derivatives, updated_at=timezone.now())
+    instance.image_derivatives = derivatives
+    return True
+
+
+def serve_derivative(request, path):
+    """
+    Development server view for derivatives. File names are content-hashed,
+    so responses can be cached forever; configure the same header on the
+    production web server for MEDIA_URL/derivatives/.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT / DERIVATIVE_DIR)
+    response['Cache-Control'] = FAR_FUTURE_CACHE_CONTROL
+    return response
@@ -0,0 +1,210 @@
+"""
+Database-backed background jobs.
+
+Signals enqueue work instead of doing it on the request path, and
+`manage.py run_jobs` runs it. A job waits in the Job table until its
+`run_after` time. Enqueueing a job while one with the same name is still
+pending debounces it: the pending job is pushed back by
+JOB_DEBOUNCE_SECONDS (but never more than JOB_DEBOUNCE_MAX_SECONDS after it
+was created) and the product ids are merged, so a burst of admin edits
+runs once. A failing job is retried with exponential backoff up to
+`max_attempts` times and then marked failed; status, attempts and the last
+traceback are visible in the admin.
+"""
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from .models import Job, Product, UserProductInteraction
+
+# Above this many changed products a job works on the whole catalog instead
+MAX_PRODUCT_IDS = 1000
+
+# Product pages requested by the cache warm-up, at most
+WARM_PRODUCT_PAGES = 50
+
+# Cache backends private to one process (or no cache at all): warming them
+# from the worker would not help the web workers
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+HANDLERS = {}
+
+
+def job(name):
+    """Register a function taking the job's payload dict as the handler for `name`."""
+    def decorator(func):
+        HANDLERS[name] = func
+        return func
+    return decorator
+
+
+def _merge_product_ids(current, new):
+    # A missing list means "all products"
+    if current is None or new is None:
+        return None
+    merged = sorted(set(current) | set(new))
+    return merged if len(merged) <= MAX_PRODUCT_IDS else None
+
+
+def _payload(product_ids):
+    return {} if product_ids is None else {'product_ids': product_ids}
+
+
+def enqueue(name, product_ids=None, delay=None, debounce=True):
+    """
+    Queue the job `name` to run after `delay` seconds (JOB_DEBOUNCE_SECONDS
+    by default), for `product_ids` or, if None, for every product. If one is
+    already pending it is reused: with `debounce` it is pushed back and its
+    product ids are merged, without it it is left as it is.
+    """
+    if delay is None:
+        delay = settings.JOB_DEBOUNCE_SECONDS
+    now = timezone.now()
+    if product_ids is not None:
+        product_ids = _merge_product_ids([], product_ids)
+
+    pending = Job.objects.filter(name=name, status='pending').order_by('id').first()
+    if pending is not None:
+        if not debounce:
+            return pending
+        latest = pending.created_at + timedelta(seconds=settings.JOB_DEBOUNCE_MAX_SECONDS)
+        run_after = min(now + timedelta(seconds=delay), latest)
+        payload = _payload(_merge_product_ids(pending.payload.get('product_ids'), product_ids))
+        # Only if no worker claimed it in the meantime
+        if Job.objects.filter(pk=pending.pk, status='pending').update(payload=payload, run_after=run_after):
+            return pending
+
+    return Job.objects.create(
+        name=name,
+        payload=_payload(product_ids),
+        run_after=now + timedelta(seconds=delay),
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+    )
+
+
+def cache_is_shared():
+    """True if the default cache is one the worker and the web workers share."""
+    return settings.CACHES['default']['BACKEND'] not in PROCESS_LOCAL_CACHES
+
+
+def enqueue_catalog_refresh(product_ids):
+    """Queue the work that follows a change to these products."""
+    product_ids = list(product_ids)
+    enqueue('refresh_similarities', product_ids)
+    enqueue('refresh_popularity')
+    if cache_is_shared():
+        enqueue('warm_catalog_cache', product_ids)
+
+
+def claim_next():
+    """Mark the next due job as running and return it, or None if nothing is due."""
+    now = timezone.now()
+    due = Job.objects.filter(status='pending', run_after__lte=now).order_by('run_after', 'id')
+    for candidate in due[:10]:
+        # Another worker may claim the same job; only one update succeeds
+        claimed = Job.objects.filter(pk=candidate.pk, status='pending').update(
+            status='running', started_at=now, finished_at=None, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            candidate.refresh_from_db()
+            return candidate
+    return None
+
+
+def run(job):
+    """Run a claimed job. Returns True on success; on failure it is retried or marked failed."""
+    handler = HANDLERS.get(job.name)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job {job.name!r}")
+        handler(job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        now = timezone.now()
+        if job.attempts < job.max_attempts:
+            backoff = settings.JOB_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+            Job.objects.filter(pk=job.pk).update(
+                status='pending', run_after=now + timedelta(seconds=backoff), last_error=error,
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(status='failed', finished_at=now, last_error=error)
+        return False
+    Job.objects.filter(pk=job.pk).update(status='done', finished_at=timezone.now(), last_error='')
+    return True
+
+
+def requeue_stale():
+    """Jobs left running by a worker that died are retried (or failed once out of attempts)."""
+    cutoff = timezone.now() - timedelta(seconds=settings.JOB_TIMEOUT_SECONDS)
+    stale = Job.objects.filter(status='running', started_at__lt=cutoff)
+    error = 'Worker stopped while running the job'
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=timezone.now(), last_error=error,
+    )
+    return failed + stale.update(status='pending', run_after=timezone.now(), last_error=error)
+
+
+def schedule_periodic():
+    """Make sure every job in JOB_SCHEDULE has a pending run at most its interval away."""
+    for name, interval in getattr(settings, 'JOB_SCHEDULE', {}).items():
+        enqueue(name, delay=interval, debounce=False)
+
+
+def prune_finished():
+    """Delete jobs that finished successfully more than JOB_RETENTION_DAYS ago."""
+    cutoff = timezone.now() - timedelta(days=settings.JOB_RETENTION_DAYS)
+    return Job.objects.filter(status='done', finished_at__lt=cutoff).delete()[0]
+
+
+# Handlers
+
+@job('refresh_similarities')
+def refresh_similarities(payload):
+    from .similarities import refresh_similarities as refresh
+    refresh(payload.get('product_ids'))
+
+
+@job('refresh_popularity')
+def refresh_popularity(payload):
+    """Store each product's interaction count, so the popular-products fallback is an index scan."""
+    counts = (
+        UserProductInteraction.objects.filter(product=OuterRef('pk'))
+        .order_by().values('product').annotate(count=Count('pk')).values('count')
+    )
+    # A queryset update: updated_at (and with it the cached product cards) is left alone
+    Product.objects.update(popularity=Coalesce(Subquery(counts), 0))
+
+
+@job('warm_catalog_cache')
+def warm_catalog_cache(payload):
+    """
+    Render the home page, the catalog and the changed products' pages as an
+    anonymous visitor, filling the page and fragment caches. Only enqueued
+    when CACHES points at a backend shared with the web workers.
+    """
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+
+    paths = [reverse('ecommerce:home'), reverse('ecommerce:product_list')]
+    product_ids = payload.get('product_ids') or []
+    slugs = Product.objects.filter(id__in=product_ids[:WARM_PRODUCT_PAGES], is_active=True).values_list('slug', flat=True)
+    paths += [reverse('ecommerce:product_detail', args=[slug]) for slug in slugs]
+
+    # The views are called directly, without the middleware stack: an
+    # anonymous visitor's request needs no session, and nothing is tracked
+    factory = RequestFactory()
+    for path in paths:
+        request = factory.get(path)
+        request.user = AnonymousUser()
+        match = resolve(path)
+        response = match.func(request, *match.args, **match.kwargs)
+        if response.status_code >= 500:
+            raise RuntimeError(f"{path} returned {response.status_code}")
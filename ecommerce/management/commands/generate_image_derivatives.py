@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from ecommerce.models import Product
+from ecommerce.images import update_derivatives
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnails and WebP versions for existing product images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate derivatives even if they are up to date')
+
+    def handle(self, *args, **options):
+        force = options['force']
+        products = Product.objects.exclude(image='').exclude(image__isnull=True).order_by('pk')
+        total = products.count()
+        updated = 0
+        self.stdout.write(f"Processing {total} products...")
+        for product in products.iterator(chunk_size=200):
+            if update_derivatives(product, force=force):
+                updated += 1
+        self.stdout.write(self.style.SUCCESS(f"Updated derivatives for {updated} of {total} products"))
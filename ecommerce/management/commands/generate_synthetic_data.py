@@ -0,0 +1,374 @@
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.text import slugify
+
+from ecommerce import jobs, search
+from ecommerce.models import (
+    Category, CustomerProfile, Order, OrderItem, Product, ProductTag, UserProductInteraction,
+)
+from ecommerce.versions import bump_catalog_version, bump_category_version
+
+CATEGORY_NAMES = [
+    'Electronics', 'Fashion', 'Home & Living', 'Sports', 'Books', 'Beauty', 'Toys', 'Garden',
+    'Automotive', 'Groceries', 'Health', 'Music', 'Office', 'Pets', 'Baby', 'Jewelry',
+    'Outdoors', 'Kitchen', 'Tools', 'Games', 'Art Supplies', 'Travel', 'Footwear', 'Watches',
+]
+ADJECTIVES = [
+    'Classic', 'Premium', 'Compact', 'Deluxe', 'Essential', 'Eco', 'Smart', 'Vintage', 'Modern',
+    'Ultra', 'Portable', 'Organic', 'Pro', 'Lite', 'Handmade', 'Wireless', 'Heavy-Duty', 'Mini',
+]
+NOUNS = [
+    'Backpack', 'Lamp', 'Headphones', 'Jacket', 'Mug', 'Notebook', 'Sneakers', 'Blender', 'Watch',
+    'Speaker', 'Chair', 'Candle', 'Yoga Mat', 'Camera', 'Novel', 'Serum', 'Puzzle', 'Kettle',
+    'Drill', 'Sunglasses', 'Scarf', 'Bottle', 'Keyboard', 'Planter', 'Blanket', 'Racket',
+]
+TAG_WORDS = [
+    'bestseller', 'new', 'gift', 'eco', 'sale', 'limited', 'bundle', 'travel', 'kids', 'outdoor',
+    'office', 'luxury', 'budget', 'handmade', 'vegan', 'wireless', 'summer', 'winter', 'classic',
+    'trending', 'durable', 'compact', 'premium', 'family', 'fitness', 'home', 'smart', 'retro',
+]
+
+INTERACTION_TYPES = ('view', 'add_to_cart', 'purchase')
+INTERACTION_SHARES = (0.75, 0.18, 0.07)
+INTERACTION_WEIGHTS = (0.1, 0.5, 1.0)
+
+ORDER_STATUSES = ('pending', 'processing', 'shipped', 'delivered', 'cancelled')
+ORDER_STATUS_SHARES = (0.05, 0.1, 0.15, 0.65, 0.05)
+
+# (income k$, spending score) centres, spreads and shares of the five
+# customer groups in the Mall Customers data the model was trained on
+CUSTOMER_GROUPS = (
+    ((26, 20), (7, 8), 0.11),
+    ((26, 79), (7, 9), 0.11),
+    ((55, 50), (9, 7), 0.40),
+    ((87, 18), (11, 9), 0.19),
+    ((86, 82), (11, 9), 0.19),
+)
+
+
+def power_law_weights(n, exponent, rng):
+    """
+    Probabilities following a power law (Zipf) over n items in random order:
+    a few items get most of the traffic, most items get very little.
+    """
+    weights = 1.0 / np.arange(1, n + 1) ** exponent
+    rng.shuffle(weights)
+    return weights / weights.sum()
+
+
+def _money(value):
+    return Decimal(f'{value:.2f}')
+
+
+def _chunks(total, size):
+    for start in range(0, total, size):
+        yield start, min(size, total - start)
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """
+    Let bulk_create keep the created_at/updated_at values set on the objects
+    (spread over the past) instead of overwriting them with the current time.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = ('Generate a large synthetic dataset (categories, tags, products, customers, interactions, '
+            'orders) with power-law popularity, loaded with batched bulk_create')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000, help='Products to create')
+        parser.add_argument('--users', type=int, default=5000, help='Customers (with profiles) to create')
+        parser.add_argument('--interactions', type=int, default=200000,
+                            help='Product interactions (views, add to cart, purchases) to create')
+        parser.add_argument('--orders', type=int, default=20000, help='Orders to create')
+        parser.add_argument('--categories', type=int, default=12, help='Categories to create')
+        parser.add_argument('--tags', type=int, default=300, help='Product tags to create')
+        parser.add_argument('--days', type=int, default=365, help='Spread timestamps over this many past days')
+        parser.add_argument('--password',
+                            help='Password for the generated customers (default: unusable, no login)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk_create batch')
+        parser.add_argument('--seed', type=int, help='Random seed for a reproducible dataset')
+
+    def _timestamps(self, count):
+        seconds = self.rng.uniform(0, self.days * 86400, size=count)
+        return [self.now - timedelta(seconds=float(s)) for s in seconds]
+
+    def _progress(self, label, done, total, started):
+        rate = done / max(time.perf_counter() - started, 1e-9)
+        self.stdout.write(f'  {label}: {done:,}/{total:,} ({rate:,.0f} rows/s)')
+
+    def _serial_start(self, model):
+        # Numbers slugs/usernames after existing rows so reruns add to the data
+        return (model.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+
+    def _create_categories(self, count):
+        start = self._serial_start(Category)
+        created_at = self._timestamps(count)
+        categories = []
+        for i in range(count):
+            name = CATEGORY_NAMES[i % len(CATEGORY_NAMES)]
+            if i >= len(CATEGORY_NAMES) or Category.objects.filter(slug=slugify(name)).exists():
+                name = f'{name} {start + i}'
+            categories.append(Category(name=name, slug=slugify(name), description=f'Synthetic {name.lower()} category',
+                                       created_at=created_at[i]))
+        Category.objects.bulk_create(categories)
+
+    def _create_tags(self, count):
+        start = self._serial_start(ProductTag)
+        words = self.rng.choice(TAG_WORDS, size=(count, 2))
+        created_at = self._timestamps(count)
+        ProductTag.objects.bulk_create([
+            ProductTag(name=f'{first}-{second}-{start + i}', slug=f'{first}-{second}-{start + i}',
+                       created_at=created_at[i])
+            for i, (first, second) in enumerate(words)
+        ], batch_size=self.batch_size)
+
+    def _create_products(self, total):
+        rng = self.rng
+        category_rows = list(Category.objects.values_list('id', 'name'))
+        category_ids = np.array([row[0] for row in category_rows])
+        tag_ids = np.array(ProductTag.objects.values_list('id', flat=True))
+        if not len(category_ids):
+            raise CommandError('No categories to put products in; use --categories')
+        # Uneven category sizes, each category with its own price level
+        category_shares = rng.dirichlet(np.full(len(category_ids), 0.7))
+        price_levels = rng.lognormal(3.5, 0.8, size=len(category_ids))
+        tag_weights = power_law_weights(len(tag_ids), 1.1, rng) if len(tag_ids) else None
+
+        start = self._serial_start(Product)
+        started = time.perf_counter()
+        for offset, size in _chunks(total, self.batch_size):
+            categories = rng.choice(len(category_ids), size=size, p=category_shares)
+            prices = np.clip(price_levels[categories] * rng.lognormal(0, 0.5, size=size), 1, 99999)
+            prices = np.floor(prices) + 0.99
+            discounted = rng.random(size) < 0.2
+            discounts = prices * rng.uniform(0.6, 0.95, size=size)
+            stock = np.where(rng.random(size) < 0.05, 0, rng.integers(1, 500, size=size))
+            active = rng.random(size) < 0.97
+            premium_price, budget_price = np.percentile(prices, [90, 20])
+            adjectives = rng.choice(ADJECTIVES, size=size)
+            nouns = rng.choice(NOUNS, size=size)
+            created_at = self._timestamps(size)
+
+            products = []
+            for i in range(size):
+                serial = start + offset + i
+                name = f'{adjectives[i]} {nouns[i]} {serial}'
+                category_name = category_rows[categories[i]][1].lower()
+                is_premium = bool(prices[i] >= premium_price)
+                is_budget = bool(prices[i] <= budget_price)
+                products.append(Product(
+                    name=name,
+                    slug=slugify(name),
+                    description=f'{adjectives[i]} {nouns[i].lower()} for {category_name} lovers.',
+                    category_id=int(category_ids[categories[i]]),
+                    price=_money(prices[i]),
+                    discount_price=_money(discounts[i]) if discounted[i] else None,
+                    stock=int(stock[i]),
+                    is_active=bool(active[i]),
+                    is_premium=is_premium,
+                    is_budget=is_budget,
+                    target_segments=[1, 4] if is_premium else [0, 3] if is_budget else [2],
+                    created_at=created_at[i],
+                    updated_at=created_at[i],
+                ))
+
+            with transaction.atomic():
+                Product.objects.bulk_create(products)
+                if tag_weights is not None:
+                    counts = rng.integers(1, 6, size=size)
+                    drawn = rng.choice(tag_ids, size=(size, 5), p=tag_weights)
+                    Product.tags.through.objects.bulk_create([
+                        Product.tags.through(product_id=product.id, producttag_id=int(tag_id))
+                        for product, row, count in zip(products, drawn, counts)
+                        for tag_id in set(row[:count])
+                    ], batch_size=self.batch_size)
+            self._progress('products', offset + size, total, started)
+
+    def _create_users(self, total, password):
+        rng = self.rng
+        password_hash = make_password(password)  # hashed once and shared, so this stays fast
+        groups = rng.choice(len(CUSTOMER_GROUPS), size=total, p=[g[2] for g in CUSTOMER_GROUPS])
+        centres = np.array([g[0] for g in CUSTOMER_GROUPS], dtype=float)[groups]
+        spreads = np.array([g[1] for g in CUSTOMER_GROUPS], dtype=float)[groups]
+        values = rng.normal(centres, spreads)
+        incomes = np.clip(values[:, 0], 15, 140)
+        scores = np.clip(np.rint(values[:, 1]), 1, 100).astype(int)
+
+        start = self._serial_start(User)
+        started = time.perf_counter()
+        for offset, size in _chunks(total, self.batch_size):
+            joined = self._timestamps(size)
+            users = [
+                User(username=f'synthetic-{start + offset + i}', email=f'synthetic-{start + offset + i}@example.com',
+                     password=password_hash, date_joined=joined[i])
+                for i in range(size)
+            ]
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                CustomerProfile.objects.bulk_create([
+                    CustomerProfile(user_id=user.id, annual_income=_money(incomes[offset + i]),
+                                    spending_score=int(scores[offset + i]),
+                                    created_at=joined[i], updated_at=joined[i])
+                    for i, user in enumerate(users)
+                ])
+            self._progress('customers', offset + size, total, started)
+
+    def _activity(self):
+        """User ids with heavy-tailed activity weights, and active product ids with power-law popularity."""
+        user_ids = np.array(User.objects.filter(is_staff=False).values_list('id', flat=True))
+        product_rows = list(Product.objects.filter(is_active=True).values_list('id', 'price', 'discount_price'))
+        if not len(user_ids) or not product_rows:
+            raise CommandError('Interactions and orders need customers and active products')
+        activity = self.rng.lognormal(0, 1.2, size=len(user_ids))
+        product_ids = np.array([row[0] for row in product_rows])
+        prices = np.array([float(row[2] or row[1]) for row in product_rows])
+        return (user_ids, activity / activity.sum(), product_ids,
+                power_law_weights(len(product_ids), 1.1, self.rng), prices)
+
+    def _create_interactions(self, total, activity):
+        rng = self.rng
+        user_ids, user_weights, product_ids, product_weights, _prices = activity
+        # Keys encode (user, product, type); popular pairs repeat, so keep
+        # drawing until there are enough distinct ones
+        products_count, types_count = len(product_ids), len(INTERACTION_TYPES)
+        keys = np.empty(0, dtype=np.int64)
+        for _attempt in range(10):
+            missing = total - len(keys)
+            if missing <= 0:
+                break
+            draw = int(missing * 1.5) + 100
+            users = rng.choice(len(user_ids), size=draw, p=user_weights).astype(np.int64)
+            products = rng.choice(products_count, size=draw, p=product_weights)
+            types = rng.choice(types_count, size=draw, p=INTERACTION_SHARES)
+            keys = np.concatenate([keys, (users * products_count + products) * types_count + types])
+            _unique, first = np.unique(keys, return_index=True)
+            keys = keys[np.sort(first)]
+        keys = keys[:total]
+        users, products, types = keys // (products_count * types_count), (keys // types_count) % products_count, keys % types_count
+        total = len(keys)
+
+        started = time.perf_counter()
+        for offset, size in _chunks(total, self.batch_size):
+            created_at = self._timestamps(size)
+            with transaction.atomic():
+                UserProductInteraction.objects.bulk_create([
+                    UserProductInteraction(
+                        user_id=int(user_ids[users[i]]),
+                        product_id=int(product_ids[products[i]]),
+                        interaction_type=INTERACTION_TYPES[types[i]],
+                        interaction_weight=INTERACTION_WEIGHTS[types[i]],
+                        created_at=created_at[i - offset],
+                    )
+                    for i in range(offset, offset + size)
+                ], ignore_conflicts=True)
+            self._progress('interactions', offset + size, total, started)
+
+    def _create_orders(self, total, activity):
+        rng = self.rng
+        user_ids, user_weights, product_ids, product_weights, prices = activity
+        started = time.perf_counter()
+        for offset, size in _chunks(total, self.batch_size):
+            users = rng.choice(len(user_ids), size=size, p=user_weights)
+            statuses = rng.choice(len(ORDER_STATUSES), size=size, p=ORDER_STATUS_SHARES)
+            item_counts = np.minimum(1 + rng.poisson(0.8, size=size), 6)
+            items = rng.choice(len(product_ids), size=int(item_counts.sum()), p=product_weights)
+            quantities = 1 + rng.poisson(0.3, size=len(items))
+            created_at = self._timestamps(size)
+
+            orders, order_items, position = [], [], 0
+            for i in range(size):
+                lines = {}
+                for item, quantity in zip(items[position:position + item_counts[i]],
+                                          quantities[position:position + item_counts[i]]):
+                    lines[item] = lines.get(item, 0) + int(quantity)
+                position += item_counts[i]
+                orders.append(Order(
+                    user_id=int(user_ids[users[i]]),
+                    order_number=uuid.uuid4().hex[:12].upper(),
+                    total_amount=_money(sum(prices[item] * quantity for item, quantity in lines.items())),
+                    status=ORDER_STATUSES[statuses[i]],
+                    shipping_address=f'{rng.integers(1, 9999)} Synthetic Street',
+                    created_at=created_at[i],
+                    updated_at=created_at[i],
+                ))
+                order_items.append(lines)
+
+            with transaction.atomic():
+                Order.objects.bulk_create(orders)
+                OrderItem.objects.bulk_create([
+                    OrderItem(order_id=order.id, product_id=int(product_ids[item]), quantity=quantity,
+                              price=_money(prices[item]), created_at=order.created_at)
+                    for order, lines in zip(orders, order_items)
+                    for item, quantity in lines.items()
+                ], batch_size=self.batch_size)
+            self._progress('orders', offset + size, total, started)
+
+    def handle(self, *args, **options):
+        self.rng = np.random.default_rng(options['seed'])
+        self.batch_size = options['batch_size']
+        self.days = options['days']
+        self.now = timezone.now()
+        started = time.perf_counter()
+
+        with explicit_timestamps(Category, ProductTag, Product, CustomerProfile,
+                                 UserProductInteraction, Order, OrderItem):
+            if options['categories']:
+                self.stdout.write(f"Creating {options['categories']:,} categories and {options['tags']:,} tags...")
+                self._create_categories(options['categories'])
+            if options['tags']:
+                self._create_tags(options['tags'])
+            if options['products']:
+                self.stdout.write(f"Creating {options['products']:,} products...")
+                self._create_products(options['products'])
+            if options['users']:
+                self.stdout.write(f"Creating {options['users']:,} customers...")
+                self._create_users(options['users'], options['password'])
+            if options['interactions'] or options['orders']:
+                activity = self._activity()
+                if options['interactions']:
+                    self.stdout.write(f"Creating {options['interactions']:,} interactions...")
+                    self._create_interactions(options['interactions'], activity)
+                if options['orders']:
+                    self.stdout.write(f"Creating {options['orders']:,} orders...")
+                    self._create_orders(options['orders'], activity)
+
+        # bulk_create skips the signals that keep these in sync
+        if options['products'] or options['categories'] or options['tags']:
+            if search.fts_available():
+                self.stdout.write('Rebuilding the search index...')
+                search.rebuild_index()
+            bump_catalog_version()
+            bump_category_version()
+            jobs.enqueue('refresh_similarities', delay=0)
+        if options['interactions'] or options['products']:
+            jobs.enqueue('refresh_popularity', delay=0)
+
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - started:.1f}s.'))
+        self.stdout.write('Similarity and popularity refreshes are queued for `manage.py run_jobs`. '
+                          'Run `manage.py resegment_customers` to assign segments to the new customers.')
@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules a web worker should not import at startup; they are loaded
+# lazily by ml_engine.registry / ml_engine.visualization when first used.
+HEAVY_PACKAGES = ('numpy', 'pandas', 'scipy', 'sklearn', 'joblib', 'matplotlib', 'seaborn', 'PIL')
+
+# What a worker imports before serving its first request
+STARTUP_SCRIPT = """
+from django.conf import settings
+settings.CLUSTER_REGISTRY_PRELOAD = False
+import django
+django.setup()
+import core.urls, ecommerce.views, web_interface.views, ml_engine.views
+"""
+
+
+def parse_importtime(output):
+    """Parse `python -X importtime` output into (name, depth, self_us, cumulative_us) rows."""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+class Command(BaseCommand):
+    help = 'Measure worker startup import time and fail if heavy ML/plotting packages load eagerly'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3,
+                            help='Fresh interpreters to measure; the fastest run is reported')
+        parser.add_argument('--top', type=int, default=15,
+                            help='Number of packages to list')
+        parser.add_argument('--max-ms', type=float,
+                            help='Fail if startup imports take longer than this')
+
+    def _measure(self):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+            cwd=settings.BASE_DIR,
+            env=os.environ.copy(),
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Startup script failed:\n{result.stderr[-2000:]}")
+        return parse_importtime(result.stderr)
+
+    def handle(self, *args, **options):
+        runs = [self._measure() for _ in range(max(options['runs'], 1))]
+        totals = [sum(row[3] for row in rows if row[1] == 0) for rows in runs]
+        rows = runs[totals.index(min(totals))]
+        total_ms = min(totals) / 1000
+
+        by_package = defaultdict(int)
+        for name, _depth, self_us, _cumulative_us in rows:
+            by_package[name.split('.')[0]] += self_us
+
+        self.stdout.write(f"Startup imports: {total_ms:.1f} ms, {len(rows)} modules "
+                          f"(fastest of {len(runs)} runs)")
+        self.stdout.write("Slowest packages (self time):")
+        ranked = sorted(by_package.items(), key=lambda item: item[1], reverse=True)
+        for package, self_us in ranked[:options['top']]:
+            self.stdout.write(f"  {package:<30} {self_us / 1000:8.1f} ms")
+
+        loaded = sorted({name.split('.')[0] for name, *_ in rows} & set(HEAVY_PACKAGES))
+        problems = []
+        if loaded:
+            problems.append(f"heavy packages imported at startup: {', '.join(loaded)}")
+        if options['max_ms'] is not None and total_ms > options['max_ms']:
+            problems.append(f"startup imports took {total_ms:.1f} ms (budget {options['max_ms']:.0f} ms)")
+        if problems:
+            raise CommandError('; '.join(problems))
+        self.stdout.write(self.style.SUCCESS("No heavy packages imported at startup."))
@@ -0,0 +1,302 @@
+import http.cookiejar
+import logging
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from ecommerce.models import Category, Product
+
+USERNAME_PREFIX = 'loadtest-'
+PERCENTILES = (50, 95, 99)
+
+
+class _TimeUp(Exception):
+    pass
+
+
+class InProcessTransport:
+    """Sends requests through the Django test client, in this process."""
+
+    def __init__(self):
+        host = settings.ALLOWED_HOSTS[0].lstrip('.') if settings.ALLOWED_HOSTS else 'localhost'
+        self.client = Client(raise_request_exception=False, HTTP_HOST='localhost' if host == '*' else host)
+
+    def request(self, method, path, data=None):
+        if method == 'POST':
+            response = self.client.post(path, data or {})
+        else:
+            response = self.client.get(path, data or {})
+        exc_info = getattr(response, 'exc_info', None)
+        error = f'{exc_info[0].__name__}: {exc_info[1]}' if exc_info else None
+        return response.status_code, error
+
+    def close(self):
+        pass
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpTransport:
+    """Sends requests to a running server, keeping cookies and the CSRF token like a browser."""
+
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect,
+        )
+
+    def _csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == settings.CSRF_COOKIE_NAME:
+                return cookie.value
+        return ''
+
+    def request(self, method, path, data=None):
+        url = self.base_url + path
+        body = None
+        headers = {'Referer': url}
+        if method == 'POST':
+            token = self._csrf_token()
+            body = urllib.parse.urlencode({**(data or {}), 'csrfmiddlewaretoken': token}).encode()
+            headers['X-CSRFToken'] = token
+        elif data:
+            url += '?' + urllib.parse.urlencode(data)
+        try:
+            with self.opener.open(urllib.request.Request(url, body, headers, method=method),
+                                  timeout=self.timeout) as response:
+                response.read()
+                return response.status, None
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code, None if e.code < 500 else f'HTTP {e.code}'
+        except (urllib.error.URLError, OSError) as e:
+            return None, f'{type(e).__name__}: {e}'
+
+    def close(self):
+        self.opener.close()
+
+
+class Shopper:
+    """
+    One scripted shopper session: log in, browse the catalog, view products,
+    maybe add to cart and check out, maybe try the segmentation form, log
+    out. Every request is recorded under its URL name.
+    """
+
+    def __init__(self, transport, username, password, catalog, rng, deadline, think_time, results):
+        self.transport = transport
+        self.username = username
+        self.password = password
+        self.catalog = catalog
+        self.rng = rng
+        self.deadline = deadline
+        self.think_time = think_time
+        self.results = results
+
+    def step(self, name, method, path, data=None):
+        if time.time() >= self.deadline:
+            raise _TimeUp
+        start = time.perf_counter()
+        try:
+            status, error = self.transport.request(method, path, data)
+        except Exception as e:
+            status, error = None, f'{type(e).__name__}: {e}'
+        elapsed = time.perf_counter() - start
+        if error is None and (status is None or status >= 400):
+            error = f'HTTP {status}'
+        self.results.append((name, elapsed, error))
+        if self.think_time:
+            time.sleep(self.rng.uniform(0, 2 * self.think_time))
+        return status
+
+    def run(self):
+        rng = self.rng
+        self.step('login', 'GET', reverse('ecommerce:login'))
+        self.step('login', 'POST', reverse('ecommerce:login'),
+                  {'username': self.username, 'password': self.password})
+
+        for _ in range(rng.randint(1, 3)):
+            category = rng.choice(self.catalog['categories'] + [None])
+            if category:
+                path = reverse('ecommerce:product_list_by_category', args=[category])
+            else:
+                path = reverse('ecommerce:product_list')
+            self.step('product_list', 'GET', path)
+
+        viewed = rng.sample(self.catalog['products'], min(len(self.catalog['products']), rng.randint(1, 4)))
+        for product_id, slug in viewed:
+            self.step('product_detail', 'GET', reverse('ecommerce:product_detail', args=[slug]))
+
+        if viewed and rng.random() < 0.5:
+            product_id, _slug = rng.choice(viewed)
+            self.step('add_to_cart', 'POST', reverse('ecommerce:add_to_cart', args=[product_id]),
+                      {'quantity': 1})
+            self.step('cart', 'GET', reverse('ecommerce:cart'))
+            if rng.random() < 0.5:
+                self.step('checkout', 'GET', reverse('ecommerce:checkout'))
+                self.step('process_checkout', 'POST', reverse('ecommerce:process_checkout'),
+                          {'shipping_address': f'{rng.randint(1, 999)} Load Test Street'})
+
+        if rng.random() < 0.3:
+            income, score = rng.randint(15, 140), rng.randint(1, 100)
+            self.step('segmentation', 'POST', reverse('index'), {'income': income, 'score': score})
+            self.step('cluster_plot', 'GET', reverse('cluster_plot'), {'income': income, 'score': score})
+
+        self.step('home', 'GET', reverse('ecommerce:home'))
+        self.step('logout', 'GET', reverse('ecommerce:logout'))
+
+
+def _percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = ('Simulate concurrent shopper sessions (login, browse, product pages, cart, checkout, '
+            'segmentation) in-process or against a running server, and report throughput, '
+            'latency percentiles and error rates per URL. Writes carts, orders and interactions '
+            'to the database: run it against a development copy.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url',
+                            help='Base URL of a running server (e.g. http://127.0.0.1:8000). It must '
+                                 'use this database. Default: drive the app in-process')
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8],
+                            help='Concurrent sessions; several values run one level after another')
+        parser.add_argument('--duration', type=float, default=15,
+                            help='Seconds per concurrency level')
+        parser.add_argument('--users', type=int,
+                            help='Shopper accounts to use (default: the highest concurrency)')
+        parser.add_argument('--password', default='loadtest-password',
+                            help='Password of the shopper accounts (created if missing)')
+        parser.add_argument('--think-time', type=float, default=0,
+                            help='Mean pause between requests of a session, in seconds')
+        parser.add_argument('--timeout', type=float, default=30, help='HTTP request timeout')
+        parser.add_argument('--seed', type=int, help='Random seed for reproducible sessions')
+
+    def _ensure_users(self, count, password):
+        usernames = [f'{USERNAME_PREFIX}{i}' for i in range(count)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        for username in usernames:
+            if username not in existing:
+                User.objects.create_user(username, f'{username}@example.com', password)
+        return usernames
+
+    def _catalog(self):
+        products = list(Product.objects.filter(is_active=True, stock__gt=0).values_list('id', 'slug'))
+        if not products:
+            raise CommandError('No active products in stock. Run create_sample_data first.')
+        return {
+            'products': products,
+            'categories': list(Category.objects.values_list('slug', flat=True)),
+        }
+
+    def _run_level(self, concurrency, usernames, catalog, options):
+        deadline = time.time() + options['duration']
+        results = [[] for _ in range(concurrency)]
+        seed = options['seed']
+
+        def worker(index):
+            rng = random.Random(None if seed is None else seed * 1000 + index)
+            username = usernames[index % len(usernames)]
+            try:
+                while time.time() < deadline:
+                    if options['url']:
+                        transport = HttpTransport(options['url'], options['timeout'])
+                    else:
+                        transport = InProcessTransport()
+                    try:
+                        Shopper(transport, username, options['password'], catalog, rng,
+                                deadline, options['think_time'], results[index]).run()
+                    except _TimeUp:
+                        pass
+                    finally:
+                        transport.close()
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        return [row for rows in results for row in rows], elapsed
+
+    def _report(self, concurrency, rows, elapsed):
+        errors = [error for _name, _elapsed, error in rows if error]
+        throughput = len(rows) / elapsed if elapsed else 0
+        error_rate = len(errors) / len(rows) if rows else 0
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'\nConcurrency {concurrency}: {len(rows)} requests in {elapsed:.1f}s, '
+            f'{throughput:.1f} req/s, {error_rate:.1%} errors'
+        ))
+        if not rows:
+            return throughput, error_rate
+
+        by_name = defaultdict(list)
+        for name, seconds, error in rows:
+            by_name[name].append((seconds, error))
+        header = f"  {'url':<18}{'requests':>9}{'errors':>8}" + ''.join(f'{f"p{p} ms":>10}' for p in PERCENTILES)
+        self.stdout.write(header + f"{'max ms':>10}")
+        for name, samples in sorted(by_name.items()):
+            latencies = sorted(seconds * 1000 for seconds, _error in samples)
+            failed = sum(1 for _seconds, error in samples if error)
+            line = f'  {name:<18}{len(samples):>9}{failed:>8}'
+            line += ''.join(f'{_percentile(latencies, p):>10.1f}' for p in PERCENTILES)
+            self.stdout.write(line + f'{latencies[-1]:>10.1f}')
+
+        if errors:
+            self.stdout.write('  Most common errors:')
+            counts = defaultdict(int)
+            for error in errors:
+                counts[error[:120]] += 1
+            for error, count in sorted(counts.items(), key=lambda item: item[1], reverse=True)[:5]:
+                self.stdout.write(f'  {count:>6}  {error}')
+        return throughput, error_rate
+
+    def handle(self, *args, **options):
+        levels = options['concurrency']
+        if any(level < 1 for level in levels):
+            raise CommandError('--concurrency values must be at least 1')
+        usernames = self._ensure_users(options['users'] or max(levels), options['password'])
+        catalog = self._catalog()
+
+        mode = f"against {options['url']}" if options['url'] else 'in-process'
+        self.stdout.write(f"Load test {mode}: {len(usernames)} shopper accounts, "
+                          f"{len(catalog['products'])} products, {options['duration']:g}s per level")
+
+        # Server errors are summarized in the report instead of logging a traceback each
+        request_logger = logging.getLogger('django.request')
+        previous_level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        summary = []
+        try:
+            for concurrency in levels:
+                rows, elapsed = self._run_level(concurrency, usernames, catalog, options)
+                summary.append((concurrency, *self._report(concurrency, rows, elapsed)))
+        finally:
+            request_logger.setLevel(previous_level)
+
+        if len(summary) > 1:
+            self.stdout.write(self.style.MIGRATE_HEADING('\nSummary'))
+            self.stdout.write(f"  {'concurrency':>11}{'req/s':>10}{'errors':>9}")
+            for concurrency, throughput, error_rate in summary:
+                self.stdout.write(f'  {concurrency:>11}{throughput:>10.1f}{error_rate:>9.1%}')
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from ecommerce import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text product search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of products indexed per batch')
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            self.stdout.write(self.style.WARNING(
+                "Full-text index is only available on SQLite; search uses icontains instead."
+            ))
+            return
+
+        self.stdout.write("Rebuilding product search index...")
+        count = search.rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} products"))
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from ecommerce.models import CustomerProfile
+from ml_engine.logic import get_cluster_names
+from ml_engine.registry import ClusterRegistry
+
+
+class Command(BaseCommand):
+    help = 'Re-assign the ML segment of every customer profile (run after retraining the model)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help='Profiles loaded, predicted and written per batch')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report how many segments would change without saving')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        registry = ClusterRegistry.get_instance()
+        if not registry.is_ready():
+            self.stderr.write(self.style.ERROR('The segmentation model could not be loaded.'))
+            return
+
+        profiles = (
+            CustomerProfile.objects
+            .exclude(annual_income__isnull=True)
+            .exclude(spending_score__isnull=True)
+            .only('id', 'annual_income', 'spending_score', 'segment', 'segment_label')
+            .order_by('pk')
+        )
+
+        processed = changed = 0
+        last_pk = 0
+        while True:
+            # Keyset chunks keep every query cheap however large the table is
+            chunk = list(profiles.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+
+            segments = registry.predict_segments(
+                [(float(p.annual_income), p.spending_score) for p in chunk]
+            )
+            labels = get_cluster_names(segments)
+
+            to_update = []
+            for profile, segment, label in zip(chunk, segments, labels):
+                if profile.segment != segment or profile.segment_label != label:
+                    profile.segment = int(segment)
+                    profile.segment_label = label
+                    to_update.append(profile)
+
+            if to_update and not options['dry_run']:
+                CustomerProfile.objects.bulk_update(to_update, ['segment', 'segment_label'])
+            processed += len(chunk)
+            changed += len(to_update)
+            self.stdout.write(f"Processed {processed} profiles...")
+
+        verb = 'Would update' if options['dry_run'] else 'Updated'
+        self.stdout.write(self.style.SUCCESS(f"{verb} {changed} of {processed} profiles"))
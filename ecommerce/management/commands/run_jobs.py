@@ -0,0 +1,65 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ecommerce import jobs
+
+# How often (seconds) the worker requeues stale jobs and prunes old ones
+HOUSEKEEPING_INTERVAL = 60
+
+
+class Command(BaseCommand):
+    help = 'Run background jobs (similarity and popularity refreshes, cache warm-up) from the job queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Run the jobs that are due now, then exit (e.g. from cron)')
+        parser.add_argument('--poll-interval', type=float, default=2,
+                            help='Seconds to wait when no job is due')
+        parser.add_argument('--max-jobs', type=int,
+                            help='Exit after running this many jobs')
+
+    def _stop(self, signum, frame):
+        self.stdout.write('Stopping after the current job...')
+        self.stopping = True
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        processed = 0
+        next_housekeeping = 0
+        while not self.stopping:
+            close_old_connections()
+            if time.monotonic() >= next_housekeeping:
+                requeued = jobs.requeue_stale()
+                if requeued:
+                    self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale job(s)'))
+                jobs.prune_finished()
+                jobs.schedule_periodic()
+                next_housekeeping = time.monotonic() + HOUSEKEEPING_INTERVAL
+
+            job = jobs.claim_next()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            started = time.perf_counter()
+            ok = jobs.run(job)
+            elapsed = time.perf_counter() - started
+            if ok:
+                self.stdout.write(self.style.SUCCESS(f'{job.name} #{job.pk} done in {elapsed:.2f}s'))
+            else:
+                self.stdout.write(self.style.ERROR(
+                    f'{job.name} #{job.pk} failed (attempt {job.attempts}/{job.max_attempts})'
+                ))
+            processed += 1
+            if options['max_jobs'] and processed >= options['max_jobs']:
+                break
+
+        self.stdout.write(f'Processed {processed} job(s).')
@@ -0,0 +1,148 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from core import sqlite_profile
+
+PRODUCTS = 2000
+USERS = 500
+
+
+def _connect(path, profile):
+    """Open a connection configured the way Django would for the profile."""
+    if profile == 'production':
+        conn = sqlite3.connect(path, timeout=sqlite_profile.BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        for statement in sqlite_profile.init_command().split(';'):
+            conn.execute(statement)
+        begin = 'BEGIN IMMEDIATE'
+    else:
+        # Django's defaults: rollback journal, deferred transactions
+        conn = sqlite3.connect(path, isolation_level=None)
+        begin = 'BEGIN'
+    return conn, begin
+
+
+def _setup(path):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE product (id INTEGER PRIMARY KEY, name TEXT, price REAL, is_active INTEGER);
+        CREATE TABLE interaction (
+            id INTEGER PRIMARY KEY, user_id INTEGER, product_id INTEGER,
+            interaction_type TEXT, interaction_weight REAL, updated_at REAL,
+            UNIQUE (user_id, product_id, interaction_type)
+        );
+        CREATE INDEX interaction_product ON interaction (product_id);
+    """)
+    conn.executemany('INSERT INTO product VALUES (?, ?, ?, 1)',
+                     [(i, f'Product {i}', random.uniform(5, 500)) for i in range(1, PRODUCTS + 1)])
+    conn.executemany(
+        'INSERT OR IGNORE INTO interaction (user_id, product_id, interaction_type, interaction_weight, updated_at) '
+        'VALUES (?, ?, ?, 0.1, 0)',
+        [(random.randint(1, USERS), random.randint(1, PRODUCTS), 'view') for _ in range(50000)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _writer(path, profile, start, deadline, results):
+    """Tracking middleware pattern: update_or_create of a view interaction."""
+    conn, begin = _connect(path, profile)
+    done = errors = 0
+    time.sleep(max(0, start - time.time()))
+    while time.time() < deadline:
+        user_id, product_id = random.randint(1, USERS), random.randint(1, PRODUCTS)
+        try:
+            conn.execute(begin)
+            row = conn.execute(
+                'SELECT id FROM interaction WHERE user_id=? AND product_id=? AND interaction_type=?',
+                (user_id, product_id, 'view'),
+            ).fetchone()
+            if row:
+                conn.execute('UPDATE interaction SET interaction_weight=0.1, updated_at=? WHERE id=?',
+                             (time.time(), row[0]))
+            else:
+                conn.execute(
+                    'INSERT INTO interaction (user_id, product_id, interaction_type, interaction_weight, updated_at) '
+                    'VALUES (?, ?, ?, 0.1, ?)', (user_id, product_id, 'view', time.time()),
+                )
+            conn.execute('COMMIT')
+            done += 1
+        except sqlite3.OperationalError:
+            errors += 1
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+    results.put(('write', done, errors))
+
+
+def _reader(path, profile, start, deadline, results):
+    """Recommendation-style aggregate over interactions joined to products."""
+    conn, _begin = _connect(path, profile)
+    done = errors = 0
+    time.sleep(max(0, start - time.time()))
+    while time.time() < deadline:
+        try:
+            conn.execute(
+                'SELECT p.id, SUM(i.interaction_weight) AS score FROM interaction i '
+                'JOIN product p ON p.id = i.product_id WHERE p.is_active = 1 AND i.user_id = ? '
+                'GROUP BY p.id ORDER BY score DESC LIMIT 12', (random.randint(1, USERS),),
+            ).fetchall()
+            done += 1
+        except sqlite3.OperationalError:
+            errors += 1
+    results.put(('read', done, errors))
+
+
+class Command(BaseCommand):
+    help = ('Concurrency stress test of SQLite with the default and the production profile '
+            '(core/sqlite_profile.py), on a throwaway database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=4, help='Writer processes')
+        parser.add_argument('--readers', type=int, default=4, help='Reader processes')
+        parser.add_argument('--seconds', type=float, default=5, help='Duration per profile')
+        parser.add_argument('--profile', choices=['default', 'production', 'both'], default='both')
+
+    def _run(self, profile, options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'stress.sqlite3')
+            _setup(path)
+            if profile == 'production':
+                # WAL is persistent; switch before the workers start
+                _connect(path, profile)[0].close()
+
+            results = multiprocessing.Queue()
+            # Give every process time to start so they all run for the full duration
+            start = time.time() + 0.5
+            deadline = start + options['seconds']
+            workers = (
+                [multiprocessing.Process(target=_writer, args=(path, profile, start, deadline, results))
+                 for _ in range(options['writers'])]
+                + [multiprocessing.Process(target=_reader, args=(path, profile, start, deadline, results))
+                   for _ in range(options['readers'])]
+            )
+            for worker in workers:
+                worker.start()
+            totals = {'read': [0, 0], 'write': [0, 0]}
+            for _ in workers:
+                kind, done, errors = results.get()
+                totals[kind][0] += done
+                totals[kind][1] += errors
+            for worker in workers:
+                worker.join()
+        return totals
+
+    def handle(self, *args, **options):
+        profiles = ['default', 'production'] if options['profile'] == 'both' else [options['profile']]
+        seconds = options['seconds']
+        self.stdout.write(f"{options['writers']} writers, {options['readers']} readers, {seconds:g}s per profile")
+        self.stdout.write(f"{'profile':<12}{'reads/s':>10}{'writes/s':>10}{'read errors':>13}{'write errors':>14}")
+        for profile in profiles:
+            totals = self._run(profile, options)
+            self.stdout.write(
+                f"{profile:<12}{totals['read'][0] / seconds:>10.0f}{totals['write'][0] / seconds:>10.0f}"
+                f"{totals['read'][1]:>13}{totals['write'][1]:>14}"
+            )
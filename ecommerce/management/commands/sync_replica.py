@@ -0,0 +1,33 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from core.db_router import replica_alias
+
+
+class Command(BaseCommand):
+    help = 'Refresh the local SQLite read replica from the primary database'
+
+    def handle(self, *args, **options):
+        alias = replica_alias()
+        if alias is None:
+            raise CommandError('No read replica configured (set DJANGO_READ_REPLICA).')
+
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        replica = settings.DATABASES[alias]
+        for database in (primary, replica):
+            if database['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError('sync_replica only copies between SQLite databases; '
+                                   'use the database server\'s replication instead.')
+
+        # The backup API copies a consistent snapshot of the primary in one
+        # step; readers of the replica see either the old or the new copy
+        source = sqlite3.connect(str(primary['NAME']))
+        target = sqlite3.connect(str(replica['NAME']))
+        try:
+            source.backup(target)
+        finally:
+            target.close()
+            source.close()
+        self.stdout.write(self.style.SUCCESS(f"Copied {primary['NAME']} to {replica['NAME']}"))
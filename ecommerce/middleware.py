@@ -1,24 +1,29 @@
 import re
 from django.utils.deprecation import MiddlewareMixin
+from core.db_router import unpinned_writes
 from .models import UserProductInteraction
 
 class UserTrackingMiddleware(MiddlewareMixin):
     def process_request(self, request):
-        if not request.user.is_authenticated or not request.method == 'GET':
+        if not request.method == 'GET':
             return None
             
-        # Track product views
+        # Track product views. The path is checked first so other requests
+        # (e.g. autocomplete keystrokes) never load the session user.
         product_detail_match = re.match(r'^/product/(?P<slug>[\w-]+)/?$', request.path)
-        if product_detail_match:
+        if product_detail_match and request.user.is_authenticated:
             from .models import Product
             try:
                 product = Product.objects.get(slug=product_detail_match.group('slug'))
-                UserProductInteraction.objects.update_or_create(
-                    user=request.user,
-                    product=product,
-                    interaction_type='view',
-                    defaults={'interaction_weight': 0.1}
-                )
+                # Recommendations may lag a view by a few seconds, so tracking
+                # leaves the page's catalog reads on the replica
+                with unpinned_writes():
+                    UserProductInteraction.objects.update_or_create(
+                        user=request.user,
+                        product=product,
+                        interaction_type='view',
+                        defaults={'interaction_weight': 0.1}
+                    )
             except Product.DoesNotExist:
                 pass
                 
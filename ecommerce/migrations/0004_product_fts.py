@@ -0,0 +1,41 @@
+# Full-text search index over products (SQLite FTS5)
+
+from django.db import migrations
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS ecommerce_product_fts USING fts5("
+        "name, description, category, tags, "
+        "tokenize = 'porter unicode61 remove_diacritics 2')"
+    )
+    # Index the products that already exist
+    schema_editor.execute(
+        "INSERT INTO ecommerce_product_fts (rowid, name, description, category, tags) "
+        "SELECT p.id, p.name, p.description, c.name, "
+        "COALESCE((SELECT group_concat(t.name, ' ') "
+        "          FROM ecommerce_product_tags pt "
+        "          JOIN ecommerce_producttag t ON t.id = pt.producttag_id "
+        "          WHERE pt.product_id = p.id), '') "
+        "FROM ecommerce_product p JOIN ecommerce_category c ON c.id = p.category_id "
+        "WHERE p.is_active = 1"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS ecommerce_product_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0003_producttag_alter_product_target_segments_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-19 04:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0007_jobs_and_popularity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productsimilarity',
+            index=models.Index(fields=['product', '-similarity_score'], name='similarity_product_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userproductinteraction',
+            index=models.Index(fields=['created_at', 'id'], name='interaction_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userproductinteraction',
+            index=models.Index(fields=['interaction_type', 'created_at', 'id'], name='interaction_type_created_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 
@@ -34,6 +35,7 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
     discount_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, validators=[MinValueValidator(0)])
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False, help_text="Resized/WebP versions of the image")
     stock = models.PositiveIntegerField(default=0)
     is_active = models.BooleanField(default=True)
     
@@ -44,12 +46,20 @@ class Product(models.Model):
     
     # New fields for recommendation system
     tags = models.ManyToManyField('ProductTag', blank=True)
+    # Number of interactions, refreshed by the background 'refresh_popularity' job
+    popularity = models.PositiveIntegerField(default=0, editable=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of the catalog and category pages
+            models.Index(fields=['is_active', 'created_at', 'id'], name='product_active_created_idx'),
+            models.Index(fields=['category', 'is_active', 'created_at', 'id'], name='product_category_created_idx'),
+            models.Index(fields=['-popularity', 'id'], name='product_popularity_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -124,6 +134,10 @@ class Order(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of a user's order history
+            models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.order_number} - {self.user.username}"
@@ -176,6 +190,11 @@ class UserProductInteraction(models.Model):
     class Meta:
         unique_together = ('user', 'product', 'interaction_type')
         ordering = ['-created_at']
+        indexes = [
+            # Newest-first listings in the admin, optionally by interaction type
+            models.Index(fields=['created_at', 'id'], name='interaction_created_idx'),
+            models.Index(fields=['interaction_type', 'created_at', 'id'], name='interaction_type_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.get_interaction_type_display()} - {self.product.name}"
@@ -189,6 +208,54 @@ class ProductSimilarity(models.Model):
     class Meta:
         unique_together = ('product', 'similar_product')
         verbose_name_plural = "Product Similarities"
+        indexes = [
+            # A product's matches, best first
+            models.Index(fields=['product', '-similarity_score'], name='similarity_product_score_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} -> {self.similar_product.name} ({self.similarity_score:.2f})"
+
+
+class Job(models.Model):
+    """A unit of background work, run by `manage.py run_jobs` (see ecommerce/jobs.py)."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # The worker's "next due job" query and enqueue's pending-job lookup
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+            models.Index(fields=['name', 'status'], name='job_name_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.get_status_display()})"
+
+
+class CatalogVersion(models.Model):
+    """
+    Single-row counter bumped on every catalog change (see ecommerce/versions.py).
+    It lives in the database, so all workers share it and a read replica
+    returns the version that matches the catalog rows it holds.
+    """
+    version = models.PositiveBigIntegerField()
+
+    def __str__(self):
+        return f"Catalog version {self.version}"
@@ -0,0 +1,106 @@
+"""
+Full-page cache for anonymous catalog traffic.
+
+Anonymous visitors without a session see exactly the same catalog pages, so
+the rendered response is cached per path and query string. Entries record
+the catalog version they were rendered at; once the catalog changes (or the
+entry is older than PAGE_CACHE_FRESH_SECONDS) the next request takes a short
+lock and re-renders while every other request keeps getting the stale copy.
+
+Like conditional_page, this must run inside the view's `replica_reads()`,
+so a page rendered from a lagging replica is stored under the replica's
+(older) catalog version rather than passed off as current.
+"""
+import hashlib
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+
+from core.metrics import count_cache
+
+from .versions import catalog_version
+
+# Cached pages are kept this long after they go stale, to be served while revalidating
+PAGE_CACHE_STORE_SECONDS = 60 * 60 * 24
+REVALIDATE_LOCK_SECONDS = 30
+
+CSRF_PLACEHOLDER = 'CSRFTOKENPLACEHOLDER'
+_CSRF_INPUT_RE = re.compile(rb'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+
+
+def _page_key(request):
+    query = hashlib.md5(request.META.get('QUERY_STRING', '').encode()).hexdigest()
+    return f'page:{request.path}:{query}'
+
+
+def is_cacheable_request(request):
+    """
+    Only plain anonymous GET/HEAD requests are cached. A session or messages
+    cookie means the visitor may be logged in or have flash messages, and
+    checking that would cost the session lookup we are trying to avoid.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if settings.SESSION_COOKIE_NAME in request.COOKIES or 'messages' in request.COOKIES:
+        return False
+    return True
+
+
+def _store(key, response, version):
+    content = _CSRF_INPUT_RE.sub(rb'\g<1>' + CSRF_PLACEHOLDER.encode() + rb'\g<2>', response.content)
+    cache.set(key, {
+        'version': version,
+        'created': time.time(),
+        'content': content,
+        'content_type': response['Content-Type'],
+    }, PAGE_CACHE_STORE_SECONDS)
+
+
+def _cached_response(request, entry, state):
+    content = entry['content']
+    if CSRF_PLACEHOLDER.encode() in content:
+        content = content.replace(CSRF_PLACEHOLDER.encode(), get_token(request).encode())
+    response = HttpResponse(content, content_type=entry['content_type'])
+    response['X-Page-Cache'] = state
+    return response
+
+
+def cache_anonymous_page(view_func):
+    """Serve anonymous requests for this view from the page cache."""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not getattr(settings, 'PAGE_CACHE_ENABLED', True) or not is_cacheable_request(request):
+            return view_func(request, *args, **kwargs)
+
+        key = _page_key(request)
+        version = catalog_version()
+        entry = cache.get(key)
+
+        if entry is not None:
+            fresh_for = getattr(settings, 'PAGE_CACHE_FRESH_SECONDS', 300)
+            is_fresh = entry['version'] == version and time.time() - entry['created'] < fresh_for
+            if is_fresh:
+                count_cache('page', 'hit')
+                return _cached_response(request, entry, 'HIT')
+            # Stale: only the request that wins the lock re-renders
+            if not cache.add(f'{key}:lock', 1, REVALIDATE_LOCK_SECONDS):
+                count_cache('page', 'stale')
+                return _cached_response(request, entry, 'STALE')
+
+        count_cache('page', 'miss')
+        try:
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                _store(key, response, version)
+                response['X-Page-Cache'] = 'MISS'
+        finally:
+            if entry is not None:
+                cache.delete(f'{key}:lock')
+        return response
+
+    return wrapper
@@ -0,0 +1,182 @@
+"""
+Keyset (cursor) pagination on (created_at, id).
+
+Instead of OFFSET, each page continues from the last row of the previous one
+with a `WHERE (created_at, id) < (cursor)` condition that the composite
+indexes on those columns can answer directly, so page N costs the same as
+page 1. Cursors are opaque, URL-safe tokens.
+
+EstimatedCountPaginator is for admin changelists over very large tables,
+where the exact COUNT(*) the admin runs on every page load is the slow part.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+def encode_cursor(obj, direction):
+    payload = json.dumps({'c': obj.created_at.isoformat(), 'i': obj.pk, 'd': direction})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (created_at, id, direction), or None for a missing or invalid cursor."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction = payload['d']
+        if direction not in (NEXT, PREVIOUS):
+            return None
+        return datetime.fromisoformat(payload['c']), int(payload['i']), direction
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class KeysetPage:
+    """A page of results, newest first, with cursors to its neighbours."""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset newest first on (created_at, id).
+    Only ever fetches `per_page + 1` rows, whatever the page.
+    """
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def get_page(self, cursor):
+        position = decode_cursor(cursor)
+        queryset = self.queryset
+
+        if position is None:
+            rows = list(queryset.order_by('-created_at', '-id')[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_next, has_previous = has_more, False
+        else:
+            created_at, pk, direction = position
+            if direction == NEXT:
+                rows = list(queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+                ).order_by('-created_at', '-id')[:self.per_page + 1])
+                has_more = len(rows) > self.per_page
+                rows = rows[:self.per_page]
+                has_next, has_previous = has_more, True
+            else:
+                rows = list(queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+                ).order_by('created_at', 'id')[:self.per_page + 1])
+                has_more = len(rows) > self.per_page
+                rows = rows[:self.per_page][::-1]
+                has_next, has_previous = True, has_more
+
+        next_cursor = encode_cursor(rows[-1], NEXT) if rows and has_next else None
+        previous_cursor = encode_cursor(rows[0], PREVIOUS) if rows and has_previous else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def page_queries(request, page):
+    """
+    Query strings for the previous/next links of either a KeysetPage or a
+    regular Paginator page, keeping the other GET parameters (search, filters).
+    """
+    def build(**params):
+        query = request.GET.copy()
+        query.pop('page', None)
+        query.pop('cursor', None)
+        for key, value in params.items():
+            query[key] = value
+        return query.urlencode()
+
+    previous_query = next_query = None
+    if isinstance(page, KeysetPage):
+        if page.has_previous():
+            previous_query = build(cursor=page.previous_cursor)
+        if page.has_next():
+            next_query = build(cursor=page.next_cursor)
+    else:
+        if page.has_previous():
+            previous_query = build(page=page.previous_page_number())
+        if page.has_next():
+            next_query = build(page=page.next_page_number())
+    return previous_query, next_query
+
+
+def estimated_row_count(model, using='default'):
+    """
+    A cheap estimate of the number of rows in the model's table: the planner
+    statistics on PostgreSQL, the primary key range elsewhere (both read
+    without scanning the table). None if the table is empty or unknown.
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(model._meta.db_table)
+    pk = connection.ops.quote_name(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                           [model._meta.db_table])
+            row = cursor.fetchone()
+            # -1 until the table has been vacuumed or analyzed
+            if row and row[0] > 0:
+                return row[0]
+        cursor.execute(f'SELECT MAX({pk}) - MIN({pk}) + 1 FROM {table}')
+        row = cursor.fetchone()
+    return row[0] if row and row[0] else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator whose count never scans a large table: the unfiltered list
+    uses estimated_row_count(), and a filtered one counts at most
+    `count_limit` matching rows. Page numbers past that limit are not
+    offered; narrow the filter instead.
+
+    The estimate is approximate: the primary key range also counts ids
+    freed by deletes or skipped by `bulk_create(ignore_conflicts=True)`,
+    so the last pages of an unfiltered list can come up empty.
+    """
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None:
+                return estimate
+        return queryset.order_by()[:self.count_limit].count()
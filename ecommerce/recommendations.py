@@ -1,12 +1,16 @@
 from django.db.models import Count
+from core.db_router import replica_reads
+from core.metrics import timed
 from .models import Product, UserProductInteraction, ProductSimilarity
 
 class RecommendationEngine:
     def __init__(self, user):
         self.user = user
     
+    @timed('RecommendationEngine.get_recommendations')
+    @replica_reads()
     def get_recommendations(self, limit=10):
-        """Get hybrid recommendations for the user"""
+        """Get hybrid recommendations for the user (read from the replica when configured)"""
         # Get content-based recommendations
         content_based = self._get_content_based_recommendations(limit//2)
         
@@ -62,7 +66,7 @@ class RecommendationEngine:
         ).order_by('-interaction_count')[:limit]
     
     def _find_similar_users(self, limit=3):
-        """Find users with similar interaction patterns"""
+        """Find users with similar interaction patterns (returns user ids)"""
         # Get current user's interactions
         user_products = set(UserProductInteraction.objects.filter(
             user=self.user
@@ -71,20 +75,16 @@ class RecommendationEngine:
         if not user_products:
             return []
             
-        # Find users who interacted with the same products
-        from django.contrib.auth import get_user_model
-        User = get_user_model()
-        
-        return list(User.objects.filter(
-            userproductinteraction__product_id__in=user_products
+        # Find users who interacted with the same products, aggregating the
+        # interactions table only (no join to users)
+        return list(UserProductInteraction.objects.filter(
+            product_id__in=user_products
         ).exclude(
-            id=self.user.id
-        ).annotate(
-            common_products=Count('userproductinteraction__product')
-        ).order_by('-common_products')[:limit])
+            user_id=self.user.id
+        ).values('user_id').annotate(
+            common_products=Count('product')
+        ).order_by('-common_products').values_list('user_id', flat=True)[:limit])
     
     def _get_popular_products(self, limit):
-        """Fallback to popular products"""
-        return Product.objects.annotate(
-            popularity=Count('userproductinteraction')
-        ).order_by('-popularity')[:limit]
+        """Fallback to popular products (popularity is refreshed by a background job)"""
+        return Product.objects.order_by('-popularity', 'id')[:limit]
@@ -0,0 +1,177 @@
+"""
+Full-text product search backed by an SQLite FTS5 index.
+
+The index lives in the ``ecommerce_product_fts`` virtual table (created by
+migration 0004). Its rowid is the product id, so a search returns ranked
+product ids which can be paginated before any Product rows are loaded.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import Product
+
+FTS_TABLE = 'ecommerce_product_fts'
+
+# BM25 column weights: name, description, category, tags
+BM25_WEIGHTS = (10.0, 1.0, 3.0, 5.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fts_available():
+    """FTS5 is only used on SQLite; other backends fall back to icontains."""
+    return connection.vendor == 'sqlite'
+
+
+def build_match_query(search_query):
+    """
+    Turn free text into a safe FTS5 MATCH expression.
+    Every word must match (implicit AND) and each word is matched as a
+    prefix, so "wire earb" finds "Trendy Wireless Earbuds".
+    """
+    tokens = _TOKEN_RE.findall(search_query.lower())
+    if not tokens:
+        return None
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _document(product):
+    tags = ' '.join(tag.name for tag in product.tags.all())
+    return (product.id, product.name, product.description, product.category.name, tags)
+
+
+def index_products(products):
+    """Insert or refresh the index rows for the given products."""
+    if not products or not fts_available():
+        return
+    rows = [_document(p) for p in products if p.is_active]
+    ids = [(p.id,) for p in products]
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', ids)
+        if rows:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description, category, tags) '
+                f'VALUES (%s, %s, %s, %s, %s)',
+                rows
+            )
+
+
+def index_product_ids(product_ids):
+    """Re-index products by id, loading them with their category and tags."""
+    product_ids = list(product_ids)
+    if not product_ids or not fts_available():
+        return
+    products = list(
+        Product.objects.filter(id__in=product_ids)
+        .select_related('category')
+        .prefetch_related('tags')
+    )
+    found = {p.id for p in products}
+    remove_product_ids(set(product_ids) - found)
+    index_products(products)
+
+
+def remove_product_ids(product_ids):
+    """Drop index rows for deleted products."""
+    if not product_ids or not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+            [(pk,) for pk in product_ids]
+        )
+
+
+def rebuild_index(batch_size=500):
+    """Rebuild the whole index from the Product table. Returns the number indexed."""
+    if not fts_available():
+        return 0
+    products = (
+        Product.objects.filter(is_active=True)
+        .select_related('category')
+        .prefetch_related('tags')
+        .order_by('id')
+    )
+    count = 0
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        batch = []
+        for product in products.iterator(chunk_size=batch_size):
+            batch.append(product)
+            if len(batch) >= batch_size:
+                index_products(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            index_products(batch)
+            count += len(batch)
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return count
+
+
+def search_product_ids(search_query, category=None):
+    """
+    Return ids of active products matching the query, best match first.
+    Ranking uses BM25 with product names weighted above tags, category
+    and description.
+    """
+    if not fts_available():
+        products = Product.objects.filter(is_active=True).filter(
+            Q(name__icontains=search_query) | Q(description__icontains=search_query)
+        )
+        if category is not None:
+            products = products.filter(category=category)
+        return list(products.values_list('id', flat=True))
+
+    match = build_match_query(search_query)
+    if match is None:
+        return []
+
+    weights = ', '.join(str(w) for w in BM25_WEIGHTS)
+    sql = (
+        f'SELECT {FTS_TABLE}.rowid FROM {FTS_TABLE} '
+        f'JOIN {Product._meta.db_table} p ON p.id = {FTS_TABLE}.rowid '
+        f'WHERE {FTS_TABLE} MATCH %s AND p.is_active = 1'
+    )
+    params = [match]
+    if category is not None:
+        sql += ' AND p.category_id = %s'
+        params.append(category.id)
+    sql += f' ORDER BY bm25({FTS_TABLE}, {weights}), p.created_at DESC'
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+class RankedProducts:
+    """
+    Lazy, ordered sequence of products for a list of ranked ids.
+    Paginator only slices the page it needs, so only that page's
+    products are loaded from the database.
+    """
+
+    def __init__(self, product_ids):
+        self.product_ids = list(product_ids)
+
+    def __len__(self):
+        return len(self.product_ids)
+
+    def count(self):
+        return len(self.product_ids)
+
+    def _load(self, ids):
+        products = Product.objects.select_related('category').in_bulk(ids)
+        return [products[pk] for pk in ids if pk in products]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._load(self.product_ids[index])
+        return self._load([self.product_ids[index]])[0]
+
+    def __iter__(self):
+        return iter(self._load(self.product_ids))
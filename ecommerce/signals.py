@@ -1,6 +1,12 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
-from .models import UserProductInteraction, Cart, OrderItem
+from django.utils import timezone
+from .models import UserProductInteraction, Cart, OrderItem, Product, ProductTag, Category
+from . import search
+from .autocomplete import PrefixIndex
+from .versions import bump_category_version, bump_catalog_version
+from .images import update_derivatives
+from .jobs import enqueue_catalog_refresh
 
 @receiver(post_save, sender=Cart)
 def track_cart_additions(sender, instance, created, **kwargs):
@@ -21,3 +27,139 @@ def track_purchases(sender, instance, created, **kwargs):
             interaction_type='purchase',
             defaults={'interaction_weight': 1.0}
         )
+
+
+
+# Resized/WebP image derivatives, generated when the uploaded image changes
+
+@receiver(post_save, sender=Product)
+def generate_image_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_derivatives(instance)
+
+
+# Keep the full-text search index in sync with the catalog
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_product_ids([instance.id])
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search.remove_product_ids([instance.id])
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def reindex_product_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # Cleared from the tag side: remember which products lose the tag
+        instance._fts_product_ids = list(instance.product_set.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            search.index_product_ids([instance.id])
+        elif action == 'post_clear':
+            search.index_product_ids(getattr(instance, '_fts_product_ids', []))
+        else:
+            search.index_product_ids(pk_set or [])
+
+@receiver(post_save, sender=ProductTag)
+def reindex_tag_products(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.index_product_ids(instance.product_set.values_list('id', flat=True))
+
+@receiver(pre_delete, sender=ProductTag)
+def remember_tag_products(sender, instance, **kwargs):
+    instance._fts_product_ids = list(instance.product_set.values_list('id', flat=True))
+
+@receiver(post_delete, sender=ProductTag)
+def reindex_deleted_tag_products(sender, instance, **kwargs):
+    search.index_product_ids(getattr(instance, '_fts_product_ids', []))
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.index_product_ids(instance.products.values_list('id', flat=True))
+
+
+# Keep the in-process autocomplete index in sync (only if this process built one)
+
+@receiver(post_save, sender=Product)
+def update_autocomplete_product(sender, instance, raw=False, **kwargs):
+    index = PrefixIndex.loaded_instance()
+    if index is not None and not raw:
+        index.update_product(instance)
+
+@receiver(post_delete, sender=Product)
+def remove_autocomplete_product(sender, instance, **kwargs):
+    index = PrefixIndex.loaded_instance()
+    if index is not None:
+        index.remove_product(instance.id)
+
+@receiver(post_save, sender=ProductTag)
+def update_autocomplete_tag(sender, instance, raw=False, **kwargs):
+    index = PrefixIndex.loaded_instance()
+    if index is not None and not raw:
+        index.update_tag(instance)
+
+@receiver(post_delete, sender=ProductTag)
+def remove_autocomplete_tag(sender, instance, **kwargs):
+    index = PrefixIndex.loaded_instance()
+    if index is not None:
+        index.remove_tag(instance.id)
+
+
+# Fragment cache versions: product cards are keyed on the product's updated_at,
+# so a category change bumps its products as well as the navigation version
+
+@receiver(post_save, sender=Category)
+def bump_category_fragments(sender, instance, raw=False, **kwargs):
+    if not raw:
+        Product.objects.filter(category=instance).update(updated_at=timezone.now())
+        bump_category_version()
+
+@receiver(post_delete, sender=Category)
+def bump_deleted_category_fragments(sender, instance, **kwargs):
+    bump_category_version()
+
+
+# Anonymous page cache and ETags: any catalog change makes cached pages stale.
+# Tags are searchable, so renaming or (un)assigning one changes search results
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=ProductTag)
+@receiver(post_delete, sender=ProductTag)
+def bump_catalog_pages(sender, raw=False, **kwargs):
+    if not raw:
+        bump_catalog_version()
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def bump_catalog_pages_for_tags(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_catalog_version()
+
+
+# Similarity, popularity and cache warm-up jobs run in the background worker
+# (manage.py run_jobs); the enqueued jobs are debounced, so a burst of edits
+# runs them once
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def enqueue_product_jobs(sender, instance, raw=False, **kwargs):
+    if not raw:
+        enqueue_catalog_refresh([instance.id])
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def enqueue_product_tag_jobs(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        if not reverse:
+            enqueue_catalog_refresh([instance.id])
+        else:
+            enqueue_catalog_refresh(pk_set or getattr(instance, '_fts_product_ids', []))
+
+@receiver(post_save, sender=ProductTag)
+def enqueue_tag_jobs(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        enqueue_catalog_refresh(instance.product_set.values_list('id', flat=True))
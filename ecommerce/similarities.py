@@ -0,0 +1,85 @@
+"""
+Content-based product similarities: TF-IDF over each product's name,
+description, category and tags, keeping the top SIMILAR_PRODUCTS matches
+per product.
+
+`refresh_similarities()` rebuilds every product (the update_similarities
+command). Given product ids it only recomputes those products and the
+products that currently list them as similar, which is what the background
+job does after a product or tag is saved. Newly similar products can be
+missing from other products' lists until the next full rebuild.
+"""
+from django.db import transaction
+
+from .models import Product, ProductSimilarity
+
+SIMILAR_PRODUCTS = 5
+MIN_SIMILARITY = 0.1
+# Rows of the similarity matrix computed at once, bounding memory on large catalogs
+BLOCK_SIZE = 1000
+
+
+def _features(product):
+    tags = " ".join(tag.name for tag in product.tags.all())
+    return f"{product.name} {product.description} {product.category.name} {tags}".lower()
+
+
+def refresh_similarities(product_ids=None):
+    """
+    Recompute similar products for `product_ids` (every active product if
+    None). Returns the number of products whose similarities were written.
+    """
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    products = list(
+        Product.objects.filter(is_active=True)
+        .select_related('category')
+        .prefetch_related('tags')
+        .order_by('id')
+    )
+
+    if product_ids is None:
+        targets = list(range(len(products)))
+        stale = ProductSimilarity.objects.all()
+    else:
+        changed = set(product_ids)
+        # Products listing a changed product may need a different list now
+        changed.update(
+            ProductSimilarity.objects.filter(similar_product_id__in=list(changed))
+            .values_list('product_id', flat=True)
+        )
+        targets = [i for i, p in enumerate(products) if p.id in changed]
+        # Rows of changed products, and rows pointing at products that are no longer active
+        stale = ProductSimilarity.objects.filter(product_id__in=list(changed))
+        inactive = set(product_ids) - {p.id for p in products}
+        if inactive:
+            stale = stale | ProductSimilarity.objects.filter(similar_product_id__in=list(inactive))
+
+    rows = []
+    if products and targets:
+        vectorizer = TfidfVectorizer(stop_words='english')
+        tfidf_matrix = vectorizer.fit_transform([_features(p) for p in products])
+        for start in range(0, len(targets), BLOCK_SIZE):
+            block = targets[start:start + BLOCK_SIZE]
+            scores = cosine_similarity(tfidf_matrix[block], tfidf_matrix)
+            scores[np.arange(len(block)), block] = -1  # never similar to itself
+            count = min(SIMILAR_PRODUCTS, len(products) - 1)
+            if count <= 0:
+                break
+            best = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+            for row, index in enumerate(block):
+                for match in sorted(best[row], key=lambda j: scores[row, j], reverse=True):
+                    score = float(scores[row, match])
+                    if score > MIN_SIMILARITY:
+                        rows.append(ProductSimilarity(
+                            product=products[index],
+                            similar_product=products[match],
+                            similarity_score=score,
+                        ))
+
+    with transaction.atomic():
+        stale.delete()
+        ProductSimilarity.objects.bulk_create(rows, batch_size=1000)
+    return len(targets)
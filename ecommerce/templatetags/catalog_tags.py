@@ -0,0 +1,24 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.safestring import mark_safe
+from ecommerce.fragments import render_product_cards, render_category_nav
+
+register = template.Library()
+
+@register.simple_tag(takes_context=True)
+def product_cards(context, products, template_name='ecommerce/includes/product_card.html'):
+    """Render cached product cards for a list of products with one cache round-trip."""
+    if not products:
+        return ''
+    cards = render_product_cards(products, template_name, context.get('request'))
+    return mark_safe(''.join(cards))
+
+@register.simple_tag
+def category_nav(template_name, current_category=None, limit=None):
+    """Render the cached category navigation."""
+    return mark_safe(render_category_nav(template_name, current_category, limit))
+
+@register.filter
+def media_url(path):
+    """URL of a file stored under MEDIA_ROOT, e.g. an image derivative path."""
+    return default_storage.url(path) if path else ''
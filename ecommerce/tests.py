@@ -1,3 +1,231 @@
+import base64
+import json
+from datetime import timedelta
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import search
+from .checkout import EmptyCartError, OutOfStockError, place_order
+from .models import Cart, Category, Order, OrderItem, Product, ProductTag, UserProductInteraction
+from .pagination import NEXT, KeysetPaginator, decode_cursor, encode_cursor
+from .versions import catalog_version
+
+
+def make_product(category, name, **fields):
+    fields.setdefault('price', 10)
+    fields.setdefault('stock', 10)
+    return Product.objects.create(
+        category=category, name=name, slug=name.lower().replace(' ', '-'),
+        description=fields.pop('description', ''), **fields
+    )
+
+
+class FullTextSearchSyncTests(TestCase):
+    """The FTS index follows product, category and tag changes (see signals.py)."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Audio', slug='audio')
+        self.product = make_product(self.category, 'Wireless Earbuds', description='Noise cancelling')
+
+    def found(self, query):
+        return search.search_product_ids(query)
+
+    def test_new_product_is_searchable_by_prefix(self):
+        self.assertEqual(self.found('wire earb'), [self.product.id])
+
+    def test_rename_reindexes(self):
+        self.product.name = 'Bluetooth Headphones'
+        self.product.save()
+        self.assertEqual(self.found('earbuds'), [])
+        self.assertEqual(self.found('headphones'), [self.product.id])
+
+    def test_deactivated_and_deleted_products_drop_out(self):
+        self.product.is_active = False
+        self.product.save()
+        self.assertEqual(self.found('earbuds'), [])
+
+        other = make_product(self.category, 'Earbuds Case')
+        self.assertEqual(self.found('earbuds'), [other.id])
+        other.delete()
+        self.assertEqual(self.found('earbuds'), [])
+
+    def test_tag_add_remove_and_clear(self):
+        tag = ProductTag.objects.create(name='Gym', slug='gym')
+        self.product.tags.add(tag)
+        self.assertEqual(self.found('gym'), [self.product.id])
+        self.product.tags.remove(tag)
+        self.assertEqual(self.found('gym'), [])
+
+        tag.product_set.add(self.product)
+        self.assertEqual(self.found('gym'), [self.product.id])
+        tag.product_set.clear()
+        self.assertEqual(self.found('gym'), [])
+
+    def test_tag_rename_and_delete(self):
+        tag = ProductTag.objects.create(name='Gym', slug='gym')
+        self.product.tags.add(tag)
+        tag.name = 'Running'
+        tag.save()
+        self.assertEqual(self.found('gym'), [])
+        self.assertEqual(self.found('running'), [self.product.id])
+        tag.delete()
+        self.assertEqual(self.found('running'), [])
+
+    def test_category_rename_reindexes_its_products(self):
+        self.category.name = 'Sound'
+        self.category.save()
+        self.assertEqual(self.found('sound'), [self.product.id])
+
+    def test_rebuild_index_matches_incremental_index(self):
+        make_product(self.category, 'Wired Headset')
+        before = self.found('wire')
+        self.assertEqual(search.rebuild_index(), 2)
+        self.assertEqual(sorted(self.found('wire')), sorted(before))
+
+    def test_fts_syntax_in_queries_is_treated_as_words(self):
+        self.assertIsNone(search.build_match_query('"*)( -'))
+        self.assertEqual(self.found('"*)( -'), [])
+        self.assertEqual(self.found('earbuds" OR "x'), [])
+        self.assertEqual(self.found('"earbuds*'), [self.product.id])
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name='Home', slug='home')
+        for i in range(7):
+            make_product(category, f'Lamp {i}')
+        # Three products share a timestamp, so pages must break ties on id
+        now = timezone.now()
+        for i, product in enumerate(Product.objects.order_by('id')):
+            Product.objects.filter(pk=product.pk).update(created_at=now - timedelta(minutes=min(i, 3)))
+        self.expected = list(Product.objects.order_by('-created_at', '-id'))
+        self.paginator = KeysetPaginator(Product.objects.all(), 3)
+
+    def test_forward_and_back_visit_every_row_once(self):
+        pages = [self.paginator.get_page(None)]
+        while pages[-1].has_next():
+            pages.append(self.paginator.get_page(pages[-1].next_cursor))
+        self.assertEqual([p for page in pages for p in page], self.expected)
+        self.assertFalse(pages[0].has_previous())
+
+        back = self.paginator.get_page(pages[-1].previous_cursor)
+        self.assertEqual(list(back), list(pages[-2]))
+
+    def test_cursor_round_trip(self):
+        product = self.expected[2]
+        self.assertEqual(decode_cursor(encode_cursor(product, NEXT)), (product.created_at, product.pk, NEXT))
+
+    def test_malformed_or_tampered_cursors_are_ignored(self):
+        def token(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+        bad = [
+            'not base64!', '%%%', token([1, 2]), token({'c': 'x', 'i': 1, 'd': 'n'}),
+            token({'c': '2024-01-01T00:00:00', 'i': 'x', 'd': 'n'}),
+            token({'c': '2024-01-01T00:00:00', 'i': 1, 'd': 'sideways'}),
+            token({'c': 5, 'i': 1, 'd': 'n'}), token({'i': 1, 'd': 'n'}),
+            base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+        ]
+        first = list(self.paginator.get_page(None))
+        for cursor in bad:
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(decode_cursor(cursor))
+                self.assertEqual(list(self.paginator.get_page(cursor)), first)
+
+    def test_catalog_view_accepts_a_bad_cursor(self):
+        response = self.client.get(reverse('ecommerce:product_list'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 200)
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('shopper', password='pw')
+        category = Category.objects.create(name='Kitchen', slug='kitchen')
+        self.pan = make_product(category, 'Pan', stock=5, price=20)
+        self.pot = make_product(category, 'Pot', stock=2, price=30)
+        Cart.objects.create(user=self.user, product=self.pan, quantity=2)
+        Cart.objects.create(user=self.user, product=self.pot, quantity=1)
+
+    def stock(self):
+        return dict(Product.objects.values_list('name', 'stock'))
+
+    def test_order_decrements_stock_and_empties_cart(self):
+        order = place_order(self.user, '1 Main St')
+        self.assertEqual(order.total_amount, 70)
+        self.assertEqual(self.stock(), {'Pan': 3, 'Pot': 1})
+        self.assertEqual(
+            sorted(order.items.values_list('product__name', 'quantity')), [('Pan', 2), ('Pot', 1)]
+        )
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+        self.assertEqual(
+            UserProductInteraction.objects.filter(user=self.user, interaction_type='purchase').count(), 2
+        )
+
+    def test_oversell_rolls_back_everything(self):
+        # Another shopper bought the pots in the meantime
+        Product.objects.filter(pk=self.pot.pk).update(stock=0)
+        with self.assertRaises(OutOfStockError) as raised:
+            place_order(self.user, '1 Main St')
+        self.assertEqual([p.name for p in raised.exception.products], ['Pot'])
+        # The pan's decrement in the same UPDATE was rolled back too
+        self.assertEqual(self.stock(), {'Pan': 5, 'Pot': 0})
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 2)
+
+    def test_inactive_product_cannot_be_ordered(self):
+        Product.objects.filter(pk=self.pan.pk).update(is_active=False)
+        with self.assertRaises(OutOfStockError) as raised:
+            place_order(self.user, '1 Main St')
+        self.assertEqual([p.name for p in raised.exception.products], ['Pan'])
+        self.assertEqual(self.stock(), {'Pan': 5, 'Pot': 2})
+
+    def test_empty_cart(self):
+        Cart.objects.all().delete()
+        with self.assertRaises(EmptyCartError):
+            place_order(self.user, '1 Main St')
+
+    def test_catalog_version_only_moves_when_a_product_sells_out(self):
+        version = catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(self.user, '1 Main St')
+        self.assertEqual(catalog_version(), version)
+
+        Cart.objects.create(user=self.user, product=self.pot, quantity=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            place_order(self.user, '1 Main St')
+        self.assertNotEqual(catalog_version(), version)
+
+
+class CatalogVersionTests(TestCase):
+    """Search results follow tags, so tag changes must invalidate cached catalog pages and ETags."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Garden', slug='garden')
+        self.product = make_product(category, 'Hose')
+        self.tag = ProductTag.objects.create(name='Outdoor', slug='outdoor')
+
+    def assertBumps(self, change):
+        version = catalog_version()
+        change()
+        self.assertNotEqual(catalog_version(), version)
+
+    def test_tag_changes_bump_the_catalog_version(self):
+        self.assertBumps(lambda: self.product.tags.add(self.tag))
+        self.assertBumps(lambda: self.product.tags.remove(self.tag))
+        self.assertBumps(lambda: self.tag.product_set.add(self.product))
+        self.assertBumps(lambda: self.tag.product_set.clear())
+        self.assertBumps(lambda: ProductTag.objects.filter(pk=self.tag.pk).first().save())
+        self.assertBumps(self.tag.delete)
 
-# Create your tests here.
+    def test_list_etag_changes_with_the_catalog(self):
+        url = reverse('ecommerce:product_list')
+        self.client.get(url)  # sets the CSRF cookie, which is part of the ETag
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.tag.name = 'Patio'
+        self.tag.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
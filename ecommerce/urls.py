@@ -14,6 +14,8 @@ urlpatterns = [
     path('shop/', views.product_list, name='product_list'),
     path('category/<slug:category_slug>/', views.product_list, name='product_list_by_category'),
     path('product/<slug:product_slug>/', views.product_detail, name='product_detail'),
+    path('product/<slug:product_slug>/recommendations/', views.product_recommendations, name='product_recommendations'),
+    path('search/autocomplete/', views.autocomplete, name='autocomplete'),
     
     # Cart
     path('cart/', views.cart_view, name='cart'),
@@ -0,0 +1,62 @@
+"""
+Cache version counters for catalog data.
+
+Cached content embeds the current version in its key (or alongside its
+value); bumping the version on save makes every older entry stale at once
+without having to find and delete it.
+
+The category version only keys this worker's navigation fragments and is
+kept in the cache. The catalog version also goes into ETags and the shared
+page cache, so it is a database row: every worker sees the same value, it
+changes in the same transaction as the catalog edit, and inside
+`replica_reads()` it is read from the replica along with the page's data.
+"""
+import time
+
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import CatalogVersion
+
+CATEGORY_VERSION_KEY = 'catalog:category_version'
+CATALOG_VERSION_ID = 1
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so an evicted counter never reuses an old version
+        version = int(time.time() * 1000)
+        cache.add(key, version, None)
+        version = cache.get(key, version)
+    return version
+
+
+def bump_version(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+
+
+def category_version():
+    """Version of the category list, used by the navigation fragments."""
+    return get_version(CATEGORY_VERSION_KEY)
+
+
+def bump_category_version():
+    bump_version(CATEGORY_VERSION_KEY)
+
+
+def catalog_version():
+    """Version of the whole catalog (products, categories and tags), used by the page cache and ETags."""
+    version = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).values_list('version', flat=True).first()
+    return version or 0
+
+
+def bump_catalog_version():
+    if not CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).update(version=F('version') + 1):
+        # The row is created by migration 0009; recreate it if it was deleted
+        CatalogVersion.objects.get_or_create(
+            pk=CATALOG_VERSION_ID, defaults={'version': int(time.time() * 1000)}
+        )
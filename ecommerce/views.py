@@ -3,20 +3,31 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
-from django.db.models import Q
+from django.db.models import Q, Prefetch, QuerySet
 from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
+from django.views.decorators.cache import never_cache
 from django.core.paginator import Paginator
 from .models import Category, Product, CustomerProfile, Cart, Order, OrderItem, UserProductInteraction
+from .search import search_product_ids, RankedProducts
+from .autocomplete import PrefixIndex
+from .pagination import KeysetPaginator, page_queries
+from .page_cache import cache_anonymous_page
+from .conditional import (
+    conditional_page, product_list_validators, product_detail_validators, order_detail_validators,
+)
+from .checkout import place_order, OutOfStockError, EmptyCartError
+from .cart import cart_items, cart_totals, cart_changed
+from core.db_router import replica_reads
 from ml_engine.registry import ClusterRegistry
 from ml_engine.logic import get_cluster_name
 import json
 
 
+@replica_reads()
+@cache_anonymous_page
 def home(request):
     """Homepage with personalized product recommendations"""
-    categories = Category.objects.all()[:6]
-    
     # Get personalized recommendations
     featured_products = None
     if request.user.is_authenticated:
@@ -31,13 +42,17 @@ def home(request):
     new_products = list(Product.objects.filter(is_active=True).order_by('-created_at')[:8])
     
     context = {
-        'categories': categories,
         'featured_products': featured_products,
         'new_products': new_products,
     }
     return render(request, 'ecommerce/home.html', context)
 
 
+# Outermost, so the validators and the page cache read the catalog version
+# from the same database as the page body
+@replica_reads()
+@conditional_page(product_list_validators)
+@cache_anonymous_page
 def product_list(request, category_slug=None):
     """Product listing page with filtering"""
     products = Product.objects.filter(is_active=True)
@@ -47,8 +62,10 @@ def product_list(request, category_slug=None):
         category = get_object_or_404(Category, slug=category_slug)
         products = products.filter(category=category)
     
-    # Convert to list early for consistent handling
-    products = list(products)
+    # Full-text search: BM25-ranked ids, only the current page is loaded
+    search_query = request.GET.get('search', '').strip()
+    if search_query:
+        products = RankedProducts(search_product_ids(search_query, category=category))
     
     # Segment-based filtering for authenticated users
     if request.user.is_authenticated:
@@ -58,6 +75,7 @@ def product_list(request, category_slug=None):
                 segment_filter = request.GET.get('segment_filter', 'all')
                 if segment_filter == 'personalized':
                     # Python filtering for SQLite compatibility
+                    products = list(products)
                     segment = profile.segment
                     filtered_products = []
                     for product in products:
@@ -71,47 +89,71 @@ def product_list(request, category_slug=None):
         except CustomerProfile.DoesNotExist:
             pass
     
-    # Search
-    search_query = request.GET.get('search', '')
-    if search_query:
-        products = [p for p in products if search_query.lower() in p.name.lower() or search_query.lower() in p.description.lower()]
-    
-    # Pagination
-    paginator = Paginator(products, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
-    categories = Category.objects.all()
+    # Pagination: keyset cursors for the plain catalog, page numbers for
+    # ranked search results and the in-memory personalized list
+    if isinstance(products, QuerySet):
+        page_obj = KeysetPaginator(products, 12).get_page(request.GET.get('cursor'))
+    else:
+        paginator = Paginator(products, 12)
+        page_obj = paginator.get_page(request.GET.get('page'))
+    previous_query, next_query = page_queries(request, page_obj)
     
+    # Category navigation is rendered from the fragment cache by the template
     context = {
         'products': page_obj,
-        'categories': categories,
+        'previous_query': previous_query,
+        'next_query': next_query,
         'current_category': category,
         'search_query': search_query,
     }
     return render(request, 'ecommerce/product_list.html', context)
 
 
-def product_detail(request, product_slug):
-    """Product detail page with personalized recommendations"""
-    product = get_object_or_404(Product, slug=product_slug, is_active=True)
+def autocomplete(request):
+    """JSON search-as-you-type suggestions served from the in-process prefix index"""
+    query = request.GET.get('q', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 20)
+    except ValueError:
+        limit = 8
     
-    # Track view if user is authenticated
-    if request.user.is_authenticated:
-        UserProductInteraction.objects.update_or_create(
-            user=request.user,
-            product=product,
-            interaction_type='view',
-            defaults={'interaction_weight': 0.1}
-        )
-    
-    # Get similar products (same category)
-    similar_products = Product.objects.filter(
+    suggestions = PrefixIndex.get_instance().suggest(query, limit=limit)
+    return JsonResponse({'query': query, 'suggestions': suggestions})
+
+
+def _similar_products(product):
+    """Other active products of the same category"""
+    return Product.objects.filter(
         category=product.category,
         is_active=True
-    ).exclude(id=product.id)[:4]
+    ).exclude(id=product.id).select_related('category')[:4]
+
+
+@replica_reads()
+@conditional_page(product_detail_validators)
+@cache_anonymous_page
+def product_detail(request, product_slug):
+    """Product detail page; personalized recommendations are loaded separately"""
+    product = get_object_or_404(Product.objects.select_related('category'), slug=product_slug, is_active=True)
+    
+    # Views are tracked by UserTrackingMiddleware, which also runs for 304
+    # responses. The page only shows same-category products, so it can be
+    # validated with the product's updated_at; logged-in visitors' browsers
+    # swap in product_recommendations.
+    context = {
+        'product': product,
+        'recommended_products': _similar_products(product),
+    }
+    return render(request, 'ecommerce/product_detail.html', context)
+
+
+@never_cache
+@require_GET
+@replica_reads()
+def product_recommendations(request, product_slug):
+    """Personalized recommendations for the product page, as an HTML fragment"""
+    product = get_object_or_404(Product.objects.select_related('category'), slug=product_slug, is_active=True)
     
-    # Get personalized recommendations
     recommended_products = None
     if request.user.is_authenticated:
         from .recommendations import RecommendationEngine
@@ -119,22 +161,17 @@ def product_detail(request, product_slug):
         recommended_products = engine.get_recommendations(limit=4)
     
     context = {
-        'product': product,
-        'similar_products': similar_products,
-        'recommended_products': recommended_products or similar_products,
+        'recommended_products': recommended_products or _similar_products(product),
     }
-    return render(request, 'ecommerce/product_detail.html', context)
+    return render(request, 'ecommerce/includes/recommended_products.html', context)
 
 
 @login_required
 def cart_view(request):
     """Shopping cart page"""
-    cart_items = Cart.objects.filter(user=request.user)
-    total = sum(item.total_price for item in cart_items)
-    
     context = {
-        'cart_items': cart_items,
-        'total': total,
+        'cart_items': cart_items(request.user),
+        'total': cart_totals(request.user)['total'],
     }
     return render(request, 'ecommerce/cart.html', context)
 
@@ -162,6 +199,8 @@ def add_to_cart(request, product_id):
             cart_item.quantity = product.stock
         cart_item.save()
     
+    cart_changed(request)
+    
     # Track add to cart interaction
     UserProductInteraction.objects.update_or_create(
         user=request.user,
@@ -192,6 +231,7 @@ def update_cart(request, cart_id):
         cart_item.quantity = quantity
         cart_item.save()
         messages.success(request, 'Cart updated!')
+    cart_changed(request)
     
     return redirect('ecommerce:cart')
 
@@ -201,6 +241,7 @@ def remove_from_cart(request, cart_id):
     """Remove item from cart"""
     cart_item = get_object_or_404(Cart, id=cart_id, user=request.user)
     cart_item.delete()
+    cart_changed(request)
     messages.success(request, 'Item removed from cart.')
     return redirect('ecommerce:cart')
 
@@ -208,14 +249,12 @@ def remove_from_cart(request, cart_id):
 @login_required
 def checkout(request):
     """Checkout page"""
-    cart_items = Cart.objects.filter(user=request.user)
+    totals = cart_totals(request.user)
     
-    if not cart_items.exists():
+    if not totals['count']:
         messages.warning(request, 'Your cart is empty.')
         return redirect('ecommerce:cart')
     
-    total = sum(item.total_price for item in cart_items)
-    
     # Get user profile for pre-filling
     try:
         profile = request.user.customer_profile
@@ -223,8 +262,8 @@ def checkout(request):
         profile = None
     
     context = {
-        'cart_items': cart_items,
-        'total': total,
+        'cart_items': cart_items(request.user),
+        'total': totals['total'],
         'profile': profile,
     }
     return render(request, 'ecommerce/checkout.html', context)
@@ -234,41 +273,21 @@ def checkout(request):
 @require_POST
 def process_checkout(request):
     """Process order"""
-    cart_items = Cart.objects.filter(user=request.user)
-    
-    if not cart_items.exists():
-        messages.error(request, 'Your cart is empty.')
-        return redirect('ecommerce:cart')
-    
     shipping_address = request.POST.get('shipping_address', '')
     if not shipping_address:
         messages.error(request, 'Please provide a shipping address.')
         return redirect('ecommerce:checkout')
     
-    # Calculate total
-    total = sum(item.total_price for item in cart_items)
-    
-    # Create order
-    order = Order.objects.create(
-        user=request.user,
-        total_amount=total,
-        shipping_address=shipping_address,
-    )
-    
-    # Create order items
-    for cart_item in cart_items:
-        OrderItem.objects.create(
-            order=order,
-            product=cart_item.product,
-            quantity=cart_item.quantity,
-            price=cart_item.product.current_price,
-        )
-        # Update stock
-        cart_item.product.stock -= cart_item.quantity
-        cart_item.product.save()
-    
-    # Clear cart
-    cart_items.delete()
+    try:
+        order = place_order(request.user, shipping_address)
+        cart_changed(request)
+    except EmptyCartError:
+        messages.error(request, 'Your cart is empty.')
+        return redirect('ecommerce:cart')
+    except OutOfStockError as e:
+        names = ', '.join(p.name for p in e.products)
+        messages.error(request, f'Sorry, not enough stock left for: {names}. Please update your cart.')
+        return redirect('ecommerce:cart')
     
     messages.success(request, f'Order {order.order_number} placed successfully!')
     return redirect('ecommerce:order_detail', order_number=order.order_number)
@@ -277,14 +296,21 @@ def process_checkout(request):
 @login_required
 def order_list(request):
     """User's order history"""
-    orders = Order.objects.filter(user=request.user)
+    orders = Order.objects.filter(user=request.user).prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+    )
+    page_obj = KeysetPaginator(orders, 10).get_page(request.GET.get('cursor'))
+    previous_query, next_query = page_queries(request, page_obj)
     context = {
-        'orders': orders,
+        'orders': page_obj,
+        'previous_query': previous_query,
+        'next_query': next_query,
     }
     return render(request, 'ecommerce/order_list.html', context)
 
 
 @login_required
+@conditional_page(order_detail_validators)
 def order_detail(request, order_number):
     """Order detail page"""
     order = get_object_or_404(Order, order_number=order_number, user=request.user)
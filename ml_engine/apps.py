@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
+
+from core.startup import serves_requests
 
 
 class MlEngineConfig(AppConfig):
     name = 'ml_engine'
+
+    def ready(self):
+        # Start loading the model at startup so the first visitor does not pay for it
+        if not getattr(settings, 'CLUSTER_REGISTRY_PRELOAD', True) or not serves_requests():
+            return
+        from .registry import ClusterRegistry
+        ClusterRegistry.warm_up_in_background()
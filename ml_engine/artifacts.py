@@ -0,0 +1,216 @@
+"""
+Versioned model artifacts.
+
+Every trained model is saved as a version in saved_models/:
+
+    kmeans_<version>.pkl, scaler_<version>.pkl   the fitted sklearn objects
+    params_<version>.npy                         scaler mean/scale + centroids
+    stats_<version>.json                         per-cluster statistics
+
+The version being served is named in saved_models/CURRENT (``v1`` when the
+file does not exist). Publishing a new model means writing its files and
+then replacing CURRENT, which ClusterRegistry notices and swaps to without
+a restart.
+
+The .npy parameter file is memory-mapped when loaded, so every worker on a
+machine shares one copy through the page cache, and predicting from it
+only needs NumPy (no scikit-learn import or unpickling).
+
+Cluster statistics are computed once at training time, so loading a model
+never has to re-read or re-predict the training data.
+
+This module must not import Django: train_model.py uses it as a script.
+NumPy and pandas are imported where they are used, so importing this
+module (and the registry) stays cheap for processes that never predict.
+"""
+import json
+import os
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SAVED_MODELS_DIR = os.path.join(BASE_DIR, 'saved_models')
+CURRENT_FILE = os.path.join(SAVED_MODELS_DIR, 'CURRENT')
+DEFAULT_VERSION = 'v1'
+TRAINING_DATA_PATH = os.path.join(BASE_DIR, 'data', 'Mall_Customers.csv')
+
+
+def model_path(version):
+    return os.path.join(SAVED_MODELS_DIR, f'kmeans_{version}.pkl')
+
+
+def scaler_path(version):
+    return os.path.join(SAVED_MODELS_DIR, f'scaler_{version}.pkl')
+
+
+def params_path(version):
+    return os.path.join(SAVED_MODELS_DIR, f'params_{version}.npy')
+
+
+def stats_path(version):
+    return os.path.join(SAVED_MODELS_DIR, f'stats_{version}.json')
+
+
+def current_version():
+    """The version that should be served right now."""
+    try:
+        with open(CURRENT_FILE) as f:
+            return f.read().strip() or DEFAULT_VERSION
+    except FileNotFoundError:
+        return DEFAULT_VERSION
+
+
+def new_version():
+    return time.strftime('v%Y%m%d%H%M%S')
+
+
+def _replace_atomically(path, write):
+    tmp_path = f'{path}.tmp{os.getpid()}'
+    with open(tmp_path, 'wb') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def set_current_version(version):
+    """Point CURRENT at a version; readers never see a half-written file."""
+    _replace_atomically(CURRENT_FILE, lambda f: f.write(f'{version}\n'.encode()))
+
+
+def _check_finite(X):
+    """Reject NaN/infinity the way sklearn's input validation does."""
+    import numpy as np
+
+    X = np.asarray(X, dtype=float)
+    if not np.isfinite(X).all():
+        raise ValueError("Input X contains NaN or infinity.")
+    return X
+
+
+class ScalerParams:
+    """StandardScaler.transform backed by (possibly memory-mapped) arrays."""
+
+    def __init__(self, mean, scale):
+        self.mean_ = mean
+        self.scale_ = scale
+
+    def transform(self, X):
+        return (_check_finite(X) - self.mean_) / self.scale_
+
+
+class CentroidModel:
+    """KMeans.predict (nearest centroid) backed by a (possibly memory-mapped) array."""
+
+    def __init__(self, cluster_centers):
+        self.cluster_centers_ = cluster_centers
+        self.n_clusters = len(cluster_centers)
+        self._center_norms = (cluster_centers ** 2).sum(axis=1)
+
+    def predict(self, X):
+        X = _check_finite(X)
+        # Squared distances up to the per-row constant |x|^2, same as KMeans
+        distances = self._center_norms - 2 * X @ self.cluster_centers_.T
+        return distances.argmin(axis=1)
+
+
+def export_params(model, scaler, version):
+    """Write the .npy parameter file for a fitted model/scaler pair."""
+    import numpy as np
+
+    params = np.vstack([scaler.mean_, scaler.scale_, model.cluster_centers_]).astype(np.float64)
+    os.makedirs(SAVED_MODELS_DIR, exist_ok=True)
+    _replace_atomically(params_path(version), lambda f: np.save(f, params))
+
+
+class ClusterStatsAccumulator:
+    """
+    Builds the per-cluster statistics used for labelling from chunks of
+    [income, score] rows and their cluster IDs, one groupby per chunk.
+    """
+
+    def __init__(self):
+        self._totals = None
+
+    def add(self, X, labels):
+        import numpy as np
+        import pandas as pd
+
+        X = np.asarray(X, dtype=float)
+        chunk = pd.DataFrame({'income': X[:, 0], 'score': X[:, 1], 'cluster': labels})
+        totals = chunk.groupby('cluster').agg(
+            income_sum=('income', 'sum'), score_sum=('score', 'sum'), rows=('income', 'size'),
+        )
+        self._totals = totals if self._totals is None else self._totals.add(totals, fill_value=0)
+
+    def result(self):
+        """{cluster_id: {'mean_income', 'mean_score', 'count', 'overall_mean_income', 'overall_mean_score'}}"""
+        if self._totals is None:
+            return {}
+        totals = self._totals
+        overall_mean_income = totals['income_sum'].sum() / totals['rows'].sum()
+        overall_mean_score = totals['score_sum'].sum() / totals['rows'].sum()
+        return {
+            int(row.Index): {
+                'mean_income': float(row.income_sum / row.rows),
+                'mean_score': float(row.score_sum / row.rows),
+                'count': int(row.rows),
+                'overall_mean_income': float(overall_mean_income),
+                'overall_mean_score': float(overall_mean_score),
+            }
+            for row in totals.sort_index().itertuples()
+        }
+
+
+def analyze_csv(path, model, scaler, chunk_size=100000):
+    """Cluster statistics for a CSV in the Mall_Customers format, read in chunks."""
+    import pandas as pd
+
+    accumulator = ClusterStatsAccumulator()
+    columns = ['Annual Income (k$)', 'Spending Score (1-100)']
+    for chunk in pd.read_csv(path, usecols=columns, chunksize=chunk_size):
+        X = chunk[columns].dropna().to_numpy(dtype=float)
+        if len(X):
+            accumulator.add(X, model.predict(scaler.transform(X)))
+    return accumulator.result()
+
+
+def save_cluster_stats(stats, version):
+    payload = {str(cluster_id): values for cluster_id, values in stats.items()}
+    _replace_atomically(stats_path(version), lambda f: f.write(json.dumps(payload, indent=2).encode()))
+
+
+def load_cluster_stats(version):
+    """The saved statistics of a version, or None for versions trained before they were saved."""
+    try:
+        with open(stats_path(version)) as f:
+            return {int(cluster_id): values for cluster_id, values in json.load(f).items()}
+    except FileNotFoundError:
+        return None
+
+
+def save_artifacts(model, scaler, version, cluster_stats=None):
+    """Save every file of a version. Does not make it current."""
+    import joblib
+
+    os.makedirs(SAVED_MODELS_DIR, exist_ok=True)
+    _replace_atomically(model_path(version), lambda f: joblib.dump(model, f))
+    _replace_atomically(scaler_path(version), lambda f: joblib.dump(scaler, f))
+    export_params(model, scaler, version)
+    if cluster_stats is not None:
+        save_cluster_stats(cluster_stats, version)
+
+
+def load_predictor(version):
+    """
+    Return (model, scaler) for a version: memory-mapped NumPy objects when the
+    parameter file exists, the pickled sklearn objects otherwise.
+    Raises FileNotFoundError if the version does not exist.
+    """
+    import numpy as np
+
+    path = params_path(version)
+    if os.path.exists(path):
+        params = np.load(path, mmap_mode='r')
+        return CentroidModel(params[2:]), ScalerParams(params[0], params[1])
+
+    import joblib
+
+    return joblib.load(model_path(version)), joblib.load(scaler_path(version))
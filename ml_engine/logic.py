@@ -5,17 +5,21 @@ def get_cluster_name(cluster_id):
     """
     Dynamically determine cluster label based on actual cluster characteristics.
     This ensures labels match what's shown in the visualization.
+    Labels are computed once per model load; this is a table lookup.
     """
     from ml_engine.registry import ClusterRegistry
     
     registry = ClusterRegistry.get_instance()
-    cluster_stats = registry.get_cluster_stats()
+    label = registry.get_cluster_label(cluster_id)
     
     # If cluster stats are not available, fall back to generic label
-    if cluster_stats is None or cluster_id not in cluster_stats:
+    if label is None:
         return f"Cluster {cluster_id} (Unknown Segment)"
-    
-    stats = cluster_stats[cluster_id]
+    return label
+
+
+def describe_cluster(stats):
+    """Label a cluster from its statistics (see ClusterRegistry._analyze_clusters)."""
     mean_income = stats['mean_income']
     mean_score = stats['mean_score']
     overall_mean_income = stats['overall_mean_income']
@@ -59,4 +63,16 @@ def get_cluster_name(cluster_id):
         return "Balanced Customer (Low Income, Average Spend)"
     else:
         # Fallback for any other combination
-        return f"Customer ({income_level}, {spend_level})"
\ No newline at end of file
+        return f"Customer ({income_level}, {spend_level})"
+
+
+def get_cluster_names(cluster_ids):
+    """Labels for a batch of cluster IDs (each distinct ID is labelled once)."""
+    names = {}
+    labels = []
+    for cluster_id in cluster_ids:
+        cluster_id = int(cluster_id)
+        if cluster_id not in names:
+            names[cluster_id] = get_cluster_name(cluster_id)
+        labels.append(names[cluster_id])
+    return labels
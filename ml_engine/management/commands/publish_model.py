@@ -0,0 +1,35 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from ml_engine import artifacts
+
+
+class Command(BaseCommand):
+    help = 'Serve a saved model version (running workers switch to it without a restart)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('version', nargs='?',
+                            help='Version to serve, e.g. v1 (default: show the current version)')
+
+    def handle(self, *args, **options):
+        version = options['version']
+        if not version:
+            self.stdout.write(f"Current version: {artifacts.current_version()}")
+            return
+
+        try:
+            model, scaler = artifacts.load_predictor(version)
+        except FileNotFoundError:
+            raise CommandError(f"No artifacts for version {version} in {artifacts.SAVED_MODELS_DIR}")
+
+        # Older versions only have pickles; add the memory-mappable parameters
+        # and the cluster stats computed from the training data
+        if not os.path.exists(artifacts.params_path(version)):
+            artifacts.export_params(model, scaler, version)
+            self.stdout.write(f"Wrote {artifacts.params_path(version)}")
+        if artifacts.load_cluster_stats(version) is None:
+            artifacts.save_cluster_stats(artifacts.analyze_csv(artifacts.TRAINING_DATA_PATH, model, scaler), version)
+            self.stdout.write(f"Wrote {artifacts.stats_path(version)}")
+
+        artifacts.set_current_version(version)
+        self.stdout.write(self.style.SUCCESS(f"Now serving model version {version}"))
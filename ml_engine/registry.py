@@ -1,48 +1,230 @@
-import joblib
+import math
 import os
-import numpy as np
-import pandas as pd
+import threading
+import time
+from django.conf import settings
+from core.metrics import timed
+
+from . import artifacts
+from .logic import describe_cluster
+
+# NumPy is imported inside the methods that need it, so importing the
+# registry (e.g. via ecommerce.views) does not load the scientific stack.
+
+# Defaults for the precomputed lookup grid (see SegmentGrid)
+SEGMENT_GRID_INCOME_MAX = 200
+SEGMENT_GRID_INCOME_STEP = 1
+
+# How often each process checks saved_models/CURRENT for a new model version
+MODEL_RELOAD_CHECK_SECONDS = 5
+
+
+class SegmentGrid:
+    """
+    The model's decision surface tabulated over income (0 to income_max in
+    steps of income_step) and every integer spending score from 1 to 100.
+    Inputs that fall exactly on the grid are answered by indexing the table;
+    anything else (off-grid income, fractional or out-of-range values) is
+    left to the model, so results are identical either way.
+    """
+    SCORE_MIN = 1
+    SCORE_MAX = 100
+
+    def __init__(self, model, scaler, income_max, income_step):
+        import numpy as np
+
+        self.income_step = float(income_step)
+        self.income_rows = int(round(income_max / self.income_step)) + 1
+        incomes = np.arange(self.income_rows) * self.income_step
+        scores = np.arange(self.SCORE_MIN, self.SCORE_MAX + 1)
+        income_grid, score_grid = np.meshgrid(incomes, scores, indexing='ij')
+        points = np.column_stack([income_grid.ravel(), score_grid.ravel()])
+        self.table = model.predict(scaler.transform(points)).astype(np.int16).reshape(len(incomes), len(scores))
+
+    def lookup(self, income, score):
+        """Cluster ID for an on-grid input, or None."""
+        # Non-finite values go to the model, which rejects them
+        if not (math.isfinite(income) and math.isfinite(score)):
+            return None
+        position = income / self.income_step
+        row = round(position)
+        if abs(position - row) > 1e-9 or not 0 <= row < self.income_rows:
+            return None
+        if score != int(score) or not self.SCORE_MIN <= score <= self.SCORE_MAX:
+            return None
+        return int(self.table[row, int(score) - self.SCORE_MIN])
+
+    def lookup_many(self, data):
+        """Cluster IDs for an (n, 2) array, with -1 where the input is off-grid."""
+        import numpy as np
+
+        finite = np.isfinite(data).all(axis=1)
+        # Non-finite rows are zeroed so the arithmetic below stays quiet; they are masked out
+        data = np.where(finite[:, None], data, 0)
+        positions = data[:, 0] / self.income_step
+        rows = np.rint(positions)
+        scores = data[:, 1]
+        on_grid = (
+            finite & (np.abs(positions - rows) <= 1e-9) & (rows >= 0) & (rows < self.income_rows)
+            & (scores == np.floor(scores)) & (scores >= self.SCORE_MIN) & (scores <= self.SCORE_MAX)
+        )
+        result = np.full(len(data), -1, dtype=int)
+        result[on_grid] = self.table[rows[on_grid].astype(int), scores[on_grid].astype(int) - self.SCORE_MIN]
+        return result
+
 
 class ClusterRegistry:
     _instance = None
+    _lock = threading.Lock()
+    _reload_lock = threading.Lock()
+    _next_version_check = 0.0
+    _failed_version = None
+    _version = None  # Artifact version this instance serves
     _model = None
     _scaler = None
     _cluster_stats = None  # Store cluster characteristics
+    _load_timings = None  # Seconds spent per loading step
+    _loaded_at = None
+    _segment_grid = None  # Precomputed predictions, see SegmentGrid
+    _cluster_labels = None  # Cluster ID -> label
 
     @classmethod
     def get_instance(cls):
         """
         Singleton Pattern: Checks if the brain is loaded.
         If yes, returns it. If no, loads it first.
+        Concurrent first callers wait for a single load instead of each
+        loading their own copy; the instance is only published once loaded.
+        Once loaded, a newly published model version is picked up in the
+        background while callers keep getting the current instance.
         """
-        if cls._instance is None:
-            cls._instance = ClusterRegistry()
-            cls._instance._load_artifacts()
-        return cls._instance
+        instance = cls._instance
+        if instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    instance = ClusterRegistry()
+                    instance._load_artifacts()
+                    cls._instance = instance
+                instance = cls._instance
+        else:
+            cls._check_for_new_version(instance)
+        return instance
+
+    @classmethod
+    def _check_for_new_version(cls, instance):
+        interval = getattr(settings, 'MODEL_RELOAD_CHECK_SECONDS', MODEL_RELOAD_CHECK_SECONDS)
+        now = time.monotonic()
+        if interval is None or now < cls._next_version_check:
+            return
+        cls._next_version_check = now + interval
+
+        version = artifacts.current_version()
+        if version in (instance._version, cls._failed_version):
+            return
+        # Only one reload at a time; everyone else carries on with the old model
+        if cls._reload_lock.acquire(blocking=False):
+            threading.Thread(
+                target=cls._reload, args=(version,), name='cluster-registry-reload', daemon=True
+            ).start()
+
+    @classmethod
+    def _reload(cls, version):
+        """Load a version into a new instance and swap it in (a single attribute assignment)."""
+        try:
+            instance = ClusterRegistry()
+            instance._load_artifacts(version)
+            if instance._model is None:
+                cls._failed_version = version
+                return
+            cls._instance = instance
+        except Exception as e:
+            print(f"ERROR: Could not load model version {version}: {e}")
+            cls._failed_version = version
+        finally:
+            cls._reload_lock.release()
+
+    @classmethod
+    def warm_up(cls):
+        """Load the artifacts now (blocking). Call before forking workers to share them."""
+        return cls.get_instance()
+
+    @classmethod
+    def warm_up_in_background(cls):
+        """Start loading in a daemon thread; requests arriving meanwhile wait on the lock."""
+        if cls._instance is not None:
+            return None
+        thread = threading.Thread(target=cls.warm_up, name='cluster-registry-warm-up', daemon=True)
+        thread.start()
+        return thread
+
+    @property
+    def version(self):
+        """The artifact version this instance loaded, which may lag the published one."""
+        return self._version
 
-    def _load_artifacts(self):
+    @classmethod
+    def is_ready(cls):
+        """True once the model and scaler are loaded and predictions can be served."""
+        instance = cls._instance
+        return instance is not None and instance._model is not None and instance._scaler is not None
+
+    @classmethod
+    def status(cls):
+        """Readiness details for health checks."""
+        instance = cls._instance
+        return {
+            'ready': cls.is_ready(),
+            'loading': instance is None and cls._lock.locked(),
+            'version': instance._version if instance is not None else None,
+            'loaded_at': instance._loaded_at if instance is not None else None,
+            'timings_ms': {
+                step: round(seconds * 1000, 1)
+                for step, seconds in (instance._load_timings or {}).items()
+            } if instance is not None else {},
+        }
+
+    @classmethod
+    def _after_fork(cls):
+        # A lock held by another thread at fork time would never be released
+        # in the child; loaded artifacts themselves are shared copy-on-write.
+        cls._lock = threading.Lock()
+        cls._reload_lock = threading.Lock()
+
+    def _load_artifacts(self, version=None):
         """
-        Internal method to load the .pkl files from the hard drive.
+        Internal method to load a model version (the current one by default)
+        from the hard drive.
         """
-        # Determine the path to the 'saved_models' folder relative to this file
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        model_path = os.path.join(base_dir, 'saved_models', 'kmeans_v1.pkl')
-        scaler_path = os.path.join(base_dir, 'saved_models', 'scaler_v1.pkl')
-        data_path = os.path.join(base_dir, 'data', 'Mall_Customers.csv')
+        self._version = version or artifacts.current_version()
         
         print("---------------------------------------")
-        print(f"Loading CohortAI Artifacts...")
+        print(f"Loading CohortAI Artifacts ({self._version})...")
         
+        self._load_timings = {}
+        started = time.perf_counter()
         try:
-            self._model = joblib.load(model_path)
-            self._scaler = joblib.load(scaler_path)
+            step = time.perf_counter()
+            self._model, self._scaler = artifacts.load_predictor(self._version)
+            self._load_timings['model'] = time.perf_counter() - step
             print("Brain Loaded: K-Means Model & Scaler are ready.")
             
-            # Analyze clusters to determine their actual characteristics
-            self._analyze_clusters(data_path)
+            # Cluster characteristics are saved at training time;
+            # older versions fall back to analysing the training data
+            step = time.perf_counter()
+            self._cluster_stats = artifacts.load_cluster_stats(self._version)
+            if self._cluster_stats is None:
+                self._analyze_clusters(artifacts.TRAINING_DATA_PATH)
+            self._load_timings['cluster_stats'] = time.perf_counter() - step
+
+            step = time.perf_counter()
+            self._build_lookup_tables()
+            self._load_timings['lookup_grid'] = time.perf_counter() - step
         except FileNotFoundError:
-            print(f"ERROR: Could not find .pkl files at {model_path}")
+            print(f"ERROR: Could not find artifacts for {self._version} in {artifacts.SAVED_MODELS_DIR}")
             print("   Did you run 'train_model.py'?")
+        self._load_timings['total'] = time.perf_counter() - started
+        self._loaded_at = time.time()
+        print(f"Loaded in {self._load_timings['total'] * 1000:.0f} ms")
         print("---------------------------------------")
 
     def _analyze_clusters(self, data_path):
@@ -51,34 +233,7 @@ class ClusterRegistry:
         This ensures labels match what the clusters actually represent.
         """
         try:
-            # Load the training data
-            df = pd.read_csv(data_path)
-            df.rename(columns={
-                'Annual Income (k$)': 'Annual_Income',
-                'Spending Score (1-100)': 'Spending_Score'
-            }, inplace=True)
-            
-            # Prepare features and get cluster assignments (only Income and Spending Score)
-            features = ['Annual_Income', 'Spending_Score']
-            X = df[features].values
-            X_scaled = self._scaler.transform(X)
-            df['Cluster'] = self._model.predict(X_scaled)
-            
-            # Calculate statistics for each cluster
-            self._cluster_stats = {}
-            overall_mean_income = df['Annual_Income'].mean()
-            overall_mean_score = df['Spending_Score'].mean()
-            
-            for cluster_id in sorted(df['Cluster'].unique()):
-                cluster_data = df[df['Cluster'] == cluster_id]
-                self._cluster_stats[cluster_id] = {
-                    'mean_income': cluster_data['Annual_Income'].mean(),
-                    'mean_score': cluster_data['Spending_Score'].mean(),
-                    'count': len(cluster_data),
-                    'overall_mean_income': overall_mean_income,
-                    'overall_mean_score': overall_mean_score
-                }
-            
+            self._cluster_stats = artifacts.analyze_csv(data_path, self._model, self._scaler)
             print("Cluster characteristics analyzed and stored.")
         except Exception as e:
             print(f"Warning: Could not analyze clusters: {e}")
@@ -88,11 +243,44 @@ class ClusterRegistry:
         """Return the cluster statistics for label generation."""
         return self._cluster_stats
 
+    def _build_lookup_tables(self):
+        """Tabulate predictions and cluster labels for the freshly loaded model."""
+        if self._cluster_stats:
+            self._cluster_labels = {
+                int(cluster_id): describe_cluster(stats)
+                for cluster_id, stats in self._cluster_stats.items()
+            }
+        try:
+            self._segment_grid = SegmentGrid(
+                self._model,
+                self._scaler,
+                income_max=getattr(settings, 'SEGMENT_GRID_INCOME_MAX', SEGMENT_GRID_INCOME_MAX),
+                income_step=getattr(settings, 'SEGMENT_GRID_INCOME_STEP', SEGMENT_GRID_INCOME_STEP),
+            )
+        except Exception as e:
+            print(f"Warning: Could not build segment lookup grid: {e}")
+            self._segment_grid = None
+
+    def get_cluster_label(self, cluster_id):
+        """The precomputed label for a cluster, or None if it is unknown."""
+        if self._cluster_labels is None:
+            return None
+        return self._cluster_labels.get(cluster_id)
+
+    @timed('ClusterRegistry.predict_segment')
     def predict_segment(self, age, income, score):
         """
         Takes raw customer data, scales it, and returns the Cluster ID.
         Note: Age parameter is kept for backward compatibility but not used in clustering.
         """
+        # 0. Precomputed answer for on-grid inputs (integer score, income on the grid)
+        if self._segment_grid is not None:
+            cluster_id = self._segment_grid.lookup(income, score)
+            if cluster_id is not None:
+                return cluster_id
+
+        import numpy as np
+
         # 1. Prepare input (2D array expected by sklearn)
         # Only using Income and Spending Score as features
         raw_input = np.array([[income, score]])
@@ -105,4 +293,30 @@ class ClusterRegistry:
         # 3. Predict the Cluster
         cluster_id = self._model.predict(scaled_input)[0]
         
-        return int(cluster_id)
\ No newline at end of file
+        return int(cluster_id)
+
+    @timed('ClusterRegistry.predict_segments')
+    def predict_segments(self, data):
+        """
+        Batch version of predict_segment: takes an (n, 2) array-like of
+        [income, score] rows and returns an int array of n Cluster IDs,
+        scaling and predicting the whole batch in one vectorized call.
+        """
+        import numpy as np
+
+        raw_input = np.asarray(data, dtype=float).reshape(-1, 2)
+        if len(raw_input) == 0:
+            return np.empty(0, dtype=int)
+        if self._segment_grid is None:
+            return self._model.predict(self._scaler.transform(raw_input)).astype(int)
+
+        # Grid lookups first; only the off-grid rows go through the model
+        segments = self._segment_grid.lookup_many(raw_input)
+        missing = segments < 0
+        if missing.any():
+            segments[missing] = self._model.predict(self._scaler.transform(raw_input[missing]))
+        return segments
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=ClusterRegistry._after_fork)
@@ -1,29 +1,37 @@
 import pandas as pd
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from sklearn.preprocessing import StandardScaler
-import joblib
+import argparse
+import numpy as np
 import os
+import sys
+import time
 
 # 1. SETUP PATHS
 # Get the folder where this script lives
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BASE_DIR))
+
+from ml_engine import artifacts  # noqa: E402
 
 # Path to the dataset
 DATA_PATH = os.path.join(BASE_DIR, 'data', 'Mall_Customers.csv')
 
-# Paths where we will save the "Brain"
-MODEL_PATH = os.path.join(BASE_DIR, 'saved_models', 'kmeans_v1.pkl')
-SCALER_PATH = os.path.join(BASE_DIR, 'saved_models', 'scaler_v1.pkl')
+# Column names in the Kaggle CSV
+INCOME_COLUMN = 'Annual Income (k$)'
+SCORE_COLUMN = 'Spending Score (1-100)'
+
+N_CLUSTERS = 5
 
-def train_brain():
+def train_brain(path=DATA_PATH):
     print("Starting CohortAI Training...")
     
     # 2. LOAD DATA
-    if not os.path.exists(DATA_PATH):
-        print(f"Error: Could not find file at: {DATA_PATH}")
+    if not os.path.exists(path):
+        print(f"Error: Could not find file at: {path}")
         return
 
-    df = pd.read_csv(DATA_PATH)
+    df = pd.read_csv(path)
     print(f"Loaded {len(df)} customers from CSV.")
 
     # 3. CLEANING
@@ -47,19 +55,164 @@ def train_brain():
     # 5. TRAIN THE MODEL
     # We are asking the machine to find 5 distinct groups (Clusters)
     print("Finding patterns (K-Means)...")
-    kmeans = KMeans(n_clusters=5, init='k-means++', random_state=42)
+    kmeans = KMeans(n_clusters=N_CLUSTERS, init='k-means++', random_state=42)
     kmeans.fit(X_scaled)
 
+    # Cluster characteristics, saved with the model for labelling
+    stats = artifacts.ClusterStatsAccumulator()
+    stats.add(X, kmeans.labels_)
+
+    save_brain(kmeans, scaler, stats.result())
+
+
+def save_brain(kmeans, scaler, cluster_stats):
     # 6. SAVE THE BRAIN
-    # We must save BOTH the model and the scaler
-    os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
-    joblib.dump(kmeans, MODEL_PATH)
-    joblib.dump(scaler, SCALER_PATH)
+    # We must save BOTH the model and the scaler (plus the cluster stats),
+    # as a new version. Making it current lets running servers switch to it
+    # without a restart.
+    version = artifacts.new_version()
+    artifacts.save_artifacts(kmeans, scaler, version, cluster_stats)
+    artifacts.set_current_version(version)
 
     print("---------------------------------------")
-    print(f"Model Saved: {MODEL_PATH}")
-    print(f"Scaler Saved: {SCALER_PATH}")
+    print(f"Model Saved: {artifacts.model_path(version)}")
+    print(f"Scaler Saved: {artifacts.scaler_path(version)}")
+    print(f"Parameters Saved: {artifacts.params_path(version)}")
+    print(f"Cluster Stats Saved: {artifacts.stats_path(version)}")
+    print(f"Now serving version {version}")
     print("---------------------------------------")
 
+
+def csv_chunks(path, chunk_size):
+    """Yield [income, score] arrays from the CSV without loading it whole."""
+    for chunk in pd.read_csv(path, usecols=[INCOME_COLUMN, SCORE_COLUMN], chunksize=chunk_size):
+        yield chunk[[INCOME_COLUMN, SCORE_COLUMN]].dropna().to_numpy(dtype=float)
+
+
+def profile_chunks(chunk_size):
+    """Yield [income, score] arrays from CustomerProfile, chunked by primary key."""
+    import django
+
+    from django.conf import settings
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    settings.CLUSTER_REGISTRY_PRELOAD = False  # Not serving; skip loading the current model
+    django.setup()
+    from ecommerce.models import CustomerProfile
+
+    profiles = (
+        CustomerProfile.objects
+        .exclude(annual_income__isnull=True)
+        .exclude(spending_score__isnull=True)
+        .order_by('pk')
+    )
+    last_pk = 0
+    while True:
+        rows = list(profiles.filter(pk__gt=last_pk).values_list('pk', 'annual_income', 'spending_score')[:chunk_size])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        yield np.array([(float(income), score) for _, income, score in rows], dtype=float)
+
+
+class Progress:
+    """Prints rows processed and throughput while a pass runs."""
+
+    def __init__(self, label, every=2.0):
+        self.label = label
+        self.every = every
+        self.rows = 0
+        self.started = self.last_report = time.perf_counter()
+
+    def add(self, rows):
+        self.rows += rows
+        now = time.perf_counter()
+        if now - self.last_report >= self.every:
+            self.last_report = now
+            self.report()
+
+    def report(self, done=False):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        status = "done" if done else "..."
+        print(f"  {self.label}: {self.rows:,} rows in {elapsed:.1f}s ({self.rows / elapsed:,.0f} rows/s) {status}")
+
+
+def train_brain_streaming(source='csv', path=DATA_PATH, chunk_size=10000, epochs=1):
+    """
+    Out-of-core training: the data is read in chunks and never held in memory
+    at once. A first pass fits the scaler with partial_fit, then each epoch
+    feeds the scaled chunks to MiniBatchKMeans.partial_fit.
+    """
+    print(f"Starting CohortAI Streaming Training (source: {source})...")
+    if source == 'csv' and not os.path.exists(path):
+        print(f"Error: Could not find file at: {path}")
+        return
+
+    def chunks():
+        return csv_chunks(path, chunk_size) if source == 'csv' else profile_chunks(chunk_size)
+
+    print("Scaling data (pass 1)...")
+    scaler = StandardScaler()
+    progress = Progress("scaler")
+    for X in chunks():
+        if len(X):
+            scaler.partial_fit(X)
+            progress.add(len(X))
+    progress.report(done=True)
+    if progress.rows < N_CLUSTERS:
+        print(f"Error: Need at least {N_CLUSTERS} customers with income and spending score, found {progress.rows}.")
+        return
+
+    kmeans = MiniBatchKMeans(n_clusters=N_CLUSTERS, init='k-means++', batch_size=chunk_size, random_state=42)
+    pending = np.empty((0, 2))
+    for epoch in range(1, epochs + 1):
+        print(f"Finding patterns (MiniBatchKMeans, epoch {epoch}/{epochs})...")
+        progress = Progress(f"epoch {epoch}")
+        for X in chunks():
+            progress.add(len(X))
+            # The first partial_fit needs at least n_clusters rows to initialise
+            if len(pending):
+                X = np.vstack([pending, X])
+            if hasattr(kmeans, 'cluster_centers_') or len(X) >= N_CLUSTERS:
+                kmeans.partial_fit(scaler.transform(X))
+                pending = np.empty((0, 2))
+            else:
+                pending = X
+        progress.report(done=True)
+
+    print("Summarising clusters (final pass)...")
+    stats = artifacts.ClusterStatsAccumulator()
+    progress = Progress("stats")
+    for X in chunks():
+        if len(X):
+            stats.add(X, kmeans.predict(scaler.transform(X)))
+            progress.add(len(X))
+    progress.report(done=True)
+
+    save_brain(kmeans, scaler, stats.result())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the CohortAI customer segmentation model.")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Train out-of-core with MiniBatchKMeans (for files too large for memory)")
+    parser.add_argument('--from-profiles', action='store_true',
+                        help="Stream training data from CustomerProfile instead of the CSV (implies --streaming)")
+    parser.add_argument('--data', default=DATA_PATH, help="CSV file to train on")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="Rows per chunk in streaming mode")
+    parser.add_argument('--epochs', type=int, default=1, help="Passes over the data in streaming mode")
+    args = parser.parse_args()
+
+    if args.streaming or args.from_profiles:
+        train_brain_streaming(
+            source='profiles' if args.from_profiles else 'csv',
+            path=args.data,
+            chunk_size=args.chunk_size,
+            epochs=args.epochs,
+        )
+    else:
+        train_brain(args.data)
+
+
 if __name__ == "__main__":
-    train_brain()
\ No newline at end of file
+    main()
\ No newline at end of file
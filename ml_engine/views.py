@@ -1,3 +1,179 @@
-from django.shortcuts import render
+import csv
+import io
+import json
+import math
 
-# Create your views here.
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+
+from .logic import get_cluster_names
+from .registry import ClusterRegistry
+
+# Rows scaled and predicted per vectorized call while streaming a response
+BATCH_CHUNK_SIZE = 10000
+
+# Accepted CSV headers for each input column
+INCOME_COLUMNS = ('income', 'annual_income', 'Annual Income (k$)')
+SCORE_COLUMNS = ('score', 'spending_score', 'Spending Score (1-100)')
+ID_COLUMNS = ('id', 'customer_id', 'CustomerID')
+
+
+def readiness(request):
+    """
+    Health check for the load balancer: 200 once the segmentation model is
+    loaded, 503 while the worker is still warming up.
+    """
+    status = ClusterRegistry.status()
+    if not status['ready'] and not status['loading']:
+        ClusterRegistry.warm_up_in_background()
+    return JsonResponse(status, status=200 if status['ready'] else 503)
+
+
+def _find_column(fieldnames, candidates):
+    for name in candidates:
+        if name in fieldnames:
+            return name
+    return None
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _parse_row(income, score):
+    income, score = float(income), float(score)
+    # float() accepts "inf" and "nan", which have no segment
+    if not (math.isfinite(income) and math.isfinite(score)):
+        raise ValueError('non-finite value')
+    return income, score
+
+
+def _echo(value):
+    # NaN/Infinity parsed from a JSON body would be written back as invalid JSON
+    if isinstance(value, float) and not math.isfinite(value):
+        return str(value)
+    return value
+
+
+def _segment_rows(rows):
+    """
+    Take (id, income, score) rows and yield result dicts, predicting each
+    chunk in one call. Rows with non-numeric or non-finite values get an
+    error instead.
+    """
+    registry = ClusterRegistry.get_instance()
+    for chunk in _chunks(rows, BATCH_CHUNK_SIZE):
+        valid, parsed = [], []
+        for index, (row_id, income, score) in enumerate(chunk):
+            try:
+                parsed.append(_parse_row(income, score))
+                valid.append(index)
+            except (TypeError, ValueError):
+                pass
+        segments = registry.predict_segments(parsed)
+        labels = get_cluster_names(segments)
+        predictions = dict(zip(valid, zip(segments, labels)))
+
+        for index, (row_id, income, score) in enumerate(chunk):
+            result = {'income': _echo(income), 'score': _echo(score)}
+            if row_id is not None:
+                result['id'] = row_id
+            if index in predictions:
+                segment, label = predictions[index]
+                result['segment'] = int(segment)
+                result['segment_label'] = label
+            else:
+                result['segment'] = None
+                result['error'] = 'income and score must be numbers'
+            yield result
+
+
+def _stream_json(results):
+    yield '{"results": ['
+    for i, result in enumerate(results):
+        yield (',' if i else '') + json.dumps(result)
+    yield ']}'
+
+
+def _stream_csv(results):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['id', 'income', 'score', 'segment', 'segment_label'])
+    for result in results:
+        writer.writerow([
+            result.get('id', ''), result['income'], result['score'],
+            '' if result['segment'] is None else result['segment'],
+            result.get('segment_label', result.get('error', '')),
+        ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _rows_from_json(payload):
+    """Accept {"customers": [[income, score], ...]} or a list of {"income", "score"[, "id"]} objects."""
+    customers = payload.get('customers') if isinstance(payload, dict) else payload
+    if not isinstance(customers, list):
+        raise ValueError('Expected a "customers" list')
+    rows = []
+    for customer in customers:
+        if isinstance(customer, dict):
+            rows.append((customer.get('id'), customer.get('income'), customer.get('score')))
+        elif isinstance(customer, (list, tuple)) and len(customer) == 2:
+            rows.append((None, customer[0], customer[1]))
+        else:
+            raise ValueError('Each customer must be [income, score] or an object with income and score')
+    return rows
+
+
+def _rows_from_csv(upload):
+    reader = csv.DictReader(io.TextIOWrapper(upload, encoding='utf-8-sig'))
+    fieldnames = reader.fieldnames or []
+    income_column = _find_column(fieldnames, INCOME_COLUMNS)
+    score_column = _find_column(fieldnames, SCORE_COLUMNS)
+    if income_column is None or score_column is None:
+        raise ValueError('CSV needs an income and a score column')
+    id_column = _find_column(fieldnames, ID_COLUMNS)
+    # A generator, so large uploads are read as the response streams
+    return (
+        (row[id_column] if id_column else None, row[income_column], row[score_column])
+        for row in reader
+    )
+
+
+@require_POST
+def segment_batch(request):
+    """
+    Segment many customers at once. POST either a JSON body or a CSV file
+    upload (field "file"); results stream back as JSON, or as CSV when the
+    input was a CSV or ?format=csv is given.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Staff access required'}, status=403)
+    if not ClusterRegistry.is_ready():
+        return JsonResponse({'error': 'Segmentation model is not loaded'}, status=503)
+
+    upload = request.FILES.get('file')
+    try:
+        if upload is not None:
+            rows = _rows_from_csv(upload)
+        else:
+            rows = _rows_from_json(json.loads(request.body or b'null'))
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    output = request.GET.get('format') or ('csv' if upload is not None else 'json')
+    results = _segment_rows(rows)
+    if output == 'csv':
+        response = StreamingHttpResponse(_stream_csv(results), content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="segments.csv"'
+    else:
+        response = StreamingHttpResponse(_stream_json(results), content_type='application/json')
+    return response
@@ -1,103 +1,176 @@
-import matplotlib
-matplotlib.use('Agg')  # Required for Django to run headers-less
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
 import io
-import base64
+import math
 import os
-import numpy as np
-import joblib
+import threading
+
+from core.metrics import timed
+
+from . import artifacts
+
+# matplotlib, seaborn and pandas take over a second to import, so they are
+# only imported when a background is first rendered, not when this module
+# is imported by the views.
 
 # Define Path to Data (for background context)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_PATH = os.path.join(BASE_DIR, 'data', 'Mall_Customers.csv')
-MODEL_PATH = os.path.join(BASE_DIR, 'saved_models', 'kmeans_v1.pkl')
-SCALER_PATH = os.path.join(BASE_DIR, 'saved_models', 'scaler_v1.pkl')
 
-def generate_cluster_plot(user_income, user_score, current_cluster_id):
-    """
-    Generates a scatter plot image showing clusters in different colors.
-    This makes it clear which cluster the customer belongs to.
-    """
-    # 1. Load Background Data
-    if os.path.exists(DATA_PATH):
-        df = pd.read_csv(DATA_PATH)
-        # Rename for consistency
-        df.rename(columns={'Annual Income (k$)': 'Income', 'Spending Score (1-100)': 'Score'}, inplace=True)
-    else:
+# The background (every customer coloured by cluster) only changes when the
+# model does, so it is drawn once per (model version, cluster) and kept in
+# memory. Each request just stamps the current customer's star on a copy.
+_backgrounds = {}
+_backgrounds_lock = threading.Lock()
+
+FIGURE_SIZE = (10, 7)
+DPI = 100
+STAR_OUTER_RADIUS = 16
+STAR_INNER_RADIUS = 7
+
+
+class _Background:
+    """A rendered background plus the mapping from data to pixel coordinates."""
+
+    def __init__(self, image, x_scale, x_offset, y_scale, y_offset, axes_box):
+        self.image = image
+        self.x_scale, self.x_offset = x_scale, x_offset
+        self.y_scale, self.y_offset = y_scale, y_offset
+        self.axes_box = axes_box  # (left, top, right, bottom) in pixels
+
+    def to_pixel(self, x, y):
+        left, top, right, bottom = self.axes_box
+        px = min(max(x * self.x_scale + self.x_offset, left), right)
+        py = min(max(y * self.y_scale + self.y_offset, top), bottom)
+        return px, py
+
+
+def _load_clustered_data(version):
+    """Read the training data and label every customer with its cluster."""
+    import pandas as pd
+
+    if not os.path.exists(DATA_PATH):
         return None
+    df = pd.read_csv(DATA_PATH)
+    # Rename for consistency
+    df.rename(columns={'Annual Income (k$)': 'Income', 'Spending Score (1-100)': 'Score'}, inplace=True)
 
-    # 2. Load model and scaler to get cluster assignments
     try:
-        model = joblib.load(MODEL_PATH)
-        scaler = joblib.load(SCALER_PATH)
-        
-        # Get cluster assignments for all customers
-        # Prepare features for prediction (only Income and Spending Score)
-        df_temp = df.copy()
-        df_temp.rename(columns={'Income': 'Annual_Income', 'Score': 'Spending_Score'}, inplace=True)
-        features = ['Annual_Income', 'Spending_Score']
-        X = df_temp[features].values
-        X_scaled = scaler.transform(X)
+        model, scaler = artifacts.load_predictor(version)
+        # Only Income and Spending Score are model features
+        X_scaled = scaler.transform(df[['Income', 'Score']].values)
         df['Cluster'] = model.predict(X_scaled)
     except Exception as e:
         # If model loading fails, just show all as gray
         print(f"Warning: Could not load model for visualization: {e}")
         df['Cluster'] = -1
+    return df
+
 
-    # 3. Setup the Plot
-    # Close any existing figures to prevent multiple stars from appearing
-    plt.close('all')
-    plt.figure(figsize=(10, 7))
+def _render_background(df, current_cluster_id):
+    import matplotlib
+    matplotlib.use('Agg')  # Required for Django to run headers-less
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from matplotlib.lines import Line2D
+    import seaborn as sns
+    from PIL import Image
+
+    fig = Figure(figsize=FIGURE_SIZE, dpi=DPI)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
     sns.set_style("whitegrid")
 
-    # 4. Plot customers by cluster with different colors
-    scatter = sns.scatterplot(
-        x='Income', 
+    # Plot customers by cluster with different colors
+    sns.scatterplot(
+        x='Income',
         y='Score',
         hue='Cluster',
         palette='viridis',
         data=df,
         legend='full',
-        alpha=0.7
+        alpha=0.7,
+        ax=ax,
     )
 
-    # 5. Plot the CURRENT User (Big Red Star with black border)
-    plt.scatter(
-        x=[user_income], 
-        y=[user_score], 
-        color='red', 
-        s=400, 
-        marker='*', 
-        label='Current Customer',
-        zorder=10,  # Force it to the top
-        edgecolors='black',
-        linewidths=2
-    )
+    # Fixed limits so any customer can be placed without re-scaling the axes
+    ax.set_xlim(0, max(150, df['Income'].max() * 1.1))
+    ax.set_ylim(0, 105)
+
+    ax.set_title(f"Customer Segmentation Map (Your Customer: Cluster {current_cluster_id})", fontsize=14, fontweight='bold')
+    ax.set_xlabel("Annual Income (k$)", fontsize=12)
+    ax.set_ylabel("Spending Score (1-100)", fontsize=12)
+    ax.text(0.02, 0.98, "Note: Clusters are separated by Income and Spending Score.",
+            transform=ax.transAxes, fontsize=8, verticalalignment='top',
+            bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+    # The star itself is drawn per request; add its legend entry here
+    handles, labels = ax.get_legend_handles_labels()
+    handles.append(Line2D([], [], marker='*', color='red', markeredgecolor='black',
+                          markersize=15, linestyle='None'))
+    labels.append('Current Customer')
+    ax.legend(handles, labels, loc='upper right', fontsize=9)
+    ax.grid(True, alpha=0.3)
+
+    fig.tight_layout()
+    canvas.draw()
+
+    width, height = canvas.get_width_height()
+    image = Image.frombuffer('RGBA', (width, height), canvas.buffer_rgba(), 'raw', 'RGBA', 0, 1).convert('RGB')
+
+    # Display coordinates have their origin bottom-left; images top-left
+    (x0, y0), (x1, y1) = ax.transData.transform([(0, 0), (1, 1)])
+    x_scale, x_offset = x1 - x0, x0
+    y_scale, y_offset = -(y1 - y0), height - y0
+    bbox = ax.get_window_extent()
+    axes_box = (bbox.x0, height - bbox.y1, bbox.x1, height - bbox.y0)
+    return _Background(image, x_scale, x_offset, y_scale, y_offset, axes_box)
+
+
+def get_background(version, current_cluster_id):
+    """Return the cached background for this cluster, rendering it on first use."""
+    key = (version, current_cluster_id)
+    background = _backgrounds.get(key)
+    if background is None:
+        with _backgrounds_lock:
+            background = _backgrounds.get(key)
+            if background is None:
+                df = _load_clustered_data(key[0])
+                if df is None:
+                    return None
+                # Drop backgrounds of older model versions
+                for old_key in [k for k in _backgrounds if k[0] != key[0]]:
+                    del _backgrounds[old_key]
+                background = _render_background(df, current_cluster_id)
+                _backgrounds[key] = background
+    return background
+
+
+def _star(cx, cy):
+    points = []
+    for i in range(10):
+        radius = STAR_OUTER_RADIUS if i % 2 == 0 else STAR_INNER_RADIUS
+        angle = math.pi / 2 + i * math.pi / 5
+        points.append((cx + radius * math.cos(angle), cy - radius * math.sin(angle)))
+    return points
+
+
+@timed('render_cluster_plot_png')
+def render_cluster_plot_png(version, user_income, user_score, current_cluster_id):
+    """
+    PNG bytes of the segmentation map with the current customer marked by a
+    big red star. Only the star is drawn per call. `version` is the model
+    version that predicted `current_cluster_id`; the other customers are
+    coloured by the same model.
+    """
+    from PIL import ImageDraw
+
+    background = get_background(version, current_cluster_id)
+    if background is None:
+        return None
+
+    image = background.image.copy()
+    draw = ImageDraw.Draw(image)
+    draw.polygon(_star(*background.to_pixel(user_income, user_score)), fill='red', outline='black', width=2)
 
-    # 6. Add Labels
-    plt.title(f"Customer Segmentation Map (Your Customer: Cluster {current_cluster_id})", fontsize=14, fontweight='bold')
-    plt.xlabel("Annual Income (k$)", fontsize=12)
-    plt.ylabel("Spending Score (1-100)", fontsize=12)
-    # Add note about 3D clustering
-    plt.text(0.02, 0.98, "Note: Clusters are separated by Age, Income, and Spending Score.\nOverlapping clusters differ in Age.", 
-             transform=plt.gca().transAxes, fontsize=8, verticalalignment='top',
-             bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
-    plt.legend(loc='upper right', fontsize=9)
-    plt.grid(True, alpha=0.3)
-
-    # 7. Save to Memory (Buffer) instead of a file
     buffer = io.BytesIO()
-    plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-    buffer.seek(0)
-    
-    # 8. Convert to Base64 String (for HTML)
-    image_png = buffer.getvalue()
-    buffer.close()
-    graphic = base64.b64encode(image_png)
-    graphic = graphic.decode('utf-8')
-    
-    plt.close() # Close plot to free memory
-    
-    return graphic
\ No newline at end of file
+    image.save(buffer, format='PNG', compress_level=1)
+    return buffer.getvalue()
+
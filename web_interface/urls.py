@@ -3,4 +3,5 @@ from . import views
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('plot.png', views.cluster_plot, name='cluster_plot'),
 ]
\ No newline at end of file
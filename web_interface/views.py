@@ -1,7 +1,14 @@
+import math
+from urllib.parse import urlencode
+
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseNotFound
 from django.shortcuts import render
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET
 from ml_engine.registry import ClusterRegistry
 from ml_engine.logic import get_cluster_name
-from ml_engine.visualization import generate_cluster_plot  # <--- NEW IMPORT
+from ml_engine.visualization import render_cluster_plot_png
 from .models import CustomerLog
 
 def index(request):
@@ -18,9 +25,14 @@ def index(request):
             cluster_id = registry.predict_segment(0, income, score)  # Passing 0 for age (not used)
             segment_label = get_cluster_name(cluster_id)
 
-            # 3. Generate Plot (NEW STEP) 
-            # We pass the income and score to draw the map
-            plot_image = generate_cluster_plot(income, score, cluster_id)
+            # 3. Link to the plot; the browser fetches (and caches) it separately.
+            # The model version in the URL is the one that made this prediction,
+            # so it changes whenever a retrained model is loaded.
+            plot_url = reverse('cluster_plot') + '?' + urlencode({
+                'income': income,
+                'score': score,
+                'v': registry.version,
+            })
 
             # 4. Save to DB
             CustomerLog.objects.create(
@@ -35,7 +47,7 @@ def index(request):
                 'prediction_made': True,
                 'segment_label': segment_label,
                 'cluster_id': cluster_id,
-                'plot_image': plot_image,  # <--- Send image to HTML
+                'plot_url': plot_url,
                 'input_income': income,
                 'input_score': score,
             }
@@ -43,4 +55,32 @@ def index(request):
         except ValueError:
             context['error_message'] = "Please enter valid numbers!"
 
-    return render(request, 'index.html', context)
\ No newline at end of file
+    return render(request, 'index.html', context)
+
+
+@require_GET
+def cluster_plot(request):
+    """The segmentation map for one customer as a PNG."""
+    try:
+        income = float(request.GET['income'])
+        score = float(request.GET['score'])
+    except (KeyError, ValueError):
+        return HttpResponseBadRequest("income and score are required numbers")
+    # float() accepts "inf" and "nan", which the model and the plot cannot place
+    if not (math.isfinite(income) and math.isfinite(score)):
+        return HttpResponseBadRequest("income and score are required numbers")
+
+    # Predict and draw with one loaded model, even if a new one is published meanwhile
+    registry = ClusterRegistry.get_instance()
+    cluster_id = registry.predict_segment(0, income, score)
+    image_png = render_cluster_plot_png(registry.version, income, score, cluster_id)
+    if image_png is None:
+        return HttpResponseNotFound("Plot data is not available")
+
+    response = HttpResponse(image_png, content_type='image/png')
+    # Versioned URLs never change content; unversioned ones only briefly
+    if request.GET.get('v') == registry.version:
+        patch_cache_control(response, public=True, max_age=60 * 60 * 24 * 365, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=300)
+    return response